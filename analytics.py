@@ -0,0 +1,406 @@
+"""
+Precomputed support analytics: open backlog, complaint ageing and resolution time.
+
+Dashboards used to scan the whole customer_data table. Instead two small
+summary tables are kept up to date and read by the Support "Analytics" tab:
+
+- complaint_daily_summary (created_day, status) -> complaints
+  backlog per status, and the age buckets of unresolved complaints
+- complaint_resolution_daily (closed_day) -> closed_count, resolution_seconds
+  mean time from created_at to closed_at per day
+
+New rows (Raise Query, ingest.py, any other writer) are folded in by
+catch_up(). After `python schema.py migrate` every row carries an
+analytics_counted flag: catch-up aggregates the rows still at 0 and sets
+them to 1 in the same transaction, so a row is counted once however its id
+relates to the others (ids handed out from in-memory blocks, ingest blocks
+reserved higher up, AUTO_INCREMENT rows committing out of order). Without
+the column it falls back to a query_id watermark, which misses rows that
+commit below it. A status change applies its delta inside the UPDATE's own
+transaction (apply_status_change, or apply_status_changes for a bulk
+update) for rows already counted; the others are counted in their final
+state by the next catch-up. rebuild() recomputes everything, e.g. after rows
+were edited by hand outside the app or after adding the column:
+
+    python analytics.py catch-up
+    python analytics.py rebuild
+"""
+import argparse
+import logging
+import sys
+import threading
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from schema import ARCHIVE_TABLE, table_exists
+
+log = logging.getLogger(__name__)
+
+DAILY_TABLE = "complaint_daily_summary"
+RESOLUTION_TABLE = "complaint_resolution_daily"
+WATERMARK_TABLE = "analytics_watermark"
+WATERMARK_NAME = "customer_data"
+# created_day for rows without created_at (the summary key cannot be NULL)
+UNKNOWN_DAY = date(1970, 1, 1)
+CLOSED_STATUS = "closed"
+# per-row "already in the summaries" flag on customer_data (schema.py migrate)
+COUNTED_COLUMN = "analytics_counted"
+# uncounted rows folded per catch-up transaction
+CATCH_UP_BATCH = 5000
+
+# (minimum age in days, label) for the unresolved-complaint age buckets
+AGE_BUCKETS = [
+    (0, "today"),
+    (1, "1-2 days"),
+    (3, "3-6 days"),
+    (7, "1-4 weeks"),
+    (30, "30+ days"),
+]
+
+_FOLD_DAILY_SQL = f"""
+    INSERT INTO {DAILY_TABLE} (created_day, status, complaints)
+    SELECT COALESCE(DATE(created_at), %s), COALESCE(status, ''), COUNT(*)
+    FROM {{source}}
+    WHERE {{where}}
+    GROUP BY 1, 2
+    ON DUPLICATE KEY UPDATE complaints = complaints + VALUES(complaints)
+"""
+
+_FOLD_RESOLUTION_SQL = f"""
+    INSERT INTO {RESOLUTION_TABLE} (closed_day, closed_count, resolution_seconds)
+    SELECT DATE(closed_at), COUNT(*), SUM(TIMESTAMPDIFF(SECOND, created_at, closed_at))
+    FROM {{source}}
+    WHERE {{where}} AND closed_at IS NOT NULL AND created_at IS NOT NULL
+    GROUP BY 1
+    ON DUPLICATE KEY UPDATE closed_count = closed_count + VALUES(closed_count),
+                            resolution_seconds = resolution_seconds + VALUES(resolution_seconds)
+"""
+
+
+def age_bucket(age_days):
+    label = AGE_BUCKETS[0][1]
+    for min_days, name in AGE_BUCKETS:
+        if age_days >= min_days:
+            label = name
+    return label
+
+
+def _as_date(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+class AnalyticsSummary:
+    """
+    Maintains and reads the analytics summary tables (created on first use).
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._ready = False
+        self.counted_column = None  # COUNTED_COLUMN once customer_data has it
+        self._has_updated_at = False
+
+    # ---------------- setup ----------------
+    def ensure_tables(self):
+        """
+        Create the summary tables and the watermark row if missing. DDL commits
+        implicitly in MySQL, so this runs on its own before any transaction.
+        """
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            with self.db.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {DAILY_TABLE} (
+                        created_day DATE NOT NULL,
+                        status VARCHAR(50) NOT NULL,
+                        complaints BIGINT NOT NULL DEFAULT 0,
+                        PRIMARY KEY (created_day, status)
+                    )
+                """)
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {RESOLUTION_TABLE} (
+                        closed_day DATE NOT NULL PRIMARY KEY,
+                        closed_count BIGINT NOT NULL DEFAULT 0,
+                        resolution_seconds BIGINT NOT NULL DEFAULT 0
+                    )
+                """)
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+                        name VARCHAR(64) NOT NULL PRIMARY KEY,
+                        last_query_id BIGINT NOT NULL,
+                        updated_at DATETIME
+                    )
+                """)
+                # a fresh watermark of 0 makes the first catch-up a full build
+                cur.execute(f"INSERT IGNORE INTO {WATERMARK_TABLE} (name, last_query_id) VALUES (%s, 0)",
+                            (WATERMARK_NAME,))
+                conn.commit()
+                self._detect_columns(cur)
+                cur.close()
+            self._ready = True
+
+    def _detect_columns(self, cur):
+        cur.execute("SHOW COLUMNS FROM customer_data")
+        columns = {str(row[0]) for row in cur.fetchall()}
+        self.counted_column = COUNTED_COLUMN if COUNTED_COLUMN in columns else None
+        self._has_updated_at = "updated_at" in columns
+        return self.counted_column
+
+    def before_fields(self):
+        """
+        Columns to read (FOR UPDATE) before a status change, in the order
+        apply_status_changes expects `before`.
+        """
+        return ["status", "created_at", "closed_at"] + ([self.counted_column] if self.counted_column else [])
+
+    # ---------------- maintenance ----------------
+    def _fold(self, cur, where, params, high, sources=("customer_data",)):
+        """
+        Add the rows of each source matching `where` to the summaries and move the watermark to `high`.
+        """
+        for source in sources:
+            cur.execute(_FOLD_DAILY_SQL.format(source=source, where=where), (UNKNOWN_DAY,) + tuple(params))
+            cur.execute(_FOLD_RESOLUTION_SQL.format(source=source, where=where), tuple(params))
+        cur.execute(f"UPDATE {WATERMARK_TABLE} SET last_query_id = %s, updated_at = %s WHERE name = %s",
+                    (high, datetime.now().replace(microsecond=0), WATERMARK_NAME))
+
+    def _lock_watermark_for_update(self, cur):
+        # the watermark row lock serializes catch-ups, rebuilds and status-change deltas
+        cur.execute(f"SELECT last_query_id FROM {WATERMARK_TABLE} WHERE name = %s FOR UPDATE", (WATERMARK_NAME,))
+        return int(cur.fetchone()[0])
+
+    def _mark_counted(self, cur, ids):
+        # updated_at is kept as it is: being counted is not a change the Support feed should show
+        keep = ", updated_at = updated_at" if self._has_updated_at else ""
+        cur.execute(f"UPDATE customer_data SET {self.counted_column} = 1{keep} "
+                    f"WHERE query_id IN ({', '.join(['%s'] * len(ids))})", tuple(ids))
+
+    def catch_up(self, batch_size=CATCH_UP_BATCH):
+        """
+        Fold complaints not yet in the summaries into them (rows with
+        analytics_counted = 0, or above the watermark without that column).
+        Returns the number of complaints folded in (0 when already current).
+        """
+        self.ensure_tables()
+        folded = 0
+        while True:
+            with self.db.connection() as conn:
+                conn.start_transaction()
+                cur = conn.cursor()
+                low = self._lock_watermark_for_update(cur)
+                # the column may have been added (schema.py migrate) since this process looked
+                if self.counted_column is None and self._detect_columns(cur) is None:
+                    cur.execute("SELECT COUNT(*), COALESCE(MAX(query_id), 0) FROM customer_data WHERE query_id > %s",
+                                (low,))
+                    count, high = (int(v) for v in cur.fetchone())
+                    if count:
+                        self._fold(cur, "query_id > %s AND query_id <= %s", (low, high), high)
+                    ids = []
+                else:
+                    # the rows are locked, so a status change on one of them waits for this fold
+                    cur.execute(f"SELECT query_id FROM customer_data WHERE {self.counted_column} = 0 "
+                                f"ORDER BY query_id LIMIT %s FOR UPDATE", (int(batch_size),))
+                    ids = [int(r[0]) for r in cur.fetchall()]
+                    count = len(ids)
+                    if ids:
+                        self._fold(cur, f"query_id IN ({', '.join(['%s'] * len(ids))})", ids, max(low, ids[-1]))
+                        self._mark_counted(cur, ids)
+                conn.commit()
+                cur.close()
+            folded += count
+            if len(ids) < batch_size:
+                break
+        if folded:
+            self.db.mark_written()
+        return folded
+
+    def rebuild(self):
+        """
+        Recompute both summaries from customer_data (and the closed-complaint
+        archive, if archive.py has created it) in one transaction. With the
+        analytics_counted column, rows not counted yet are then folded in by
+        a catch-up. Returns the highest query_id seen.
+        """
+        self.ensure_tables()
+        with self.db.connection() as conn:
+            conn.start_transaction()
+            cur = conn.cursor()
+            self._lock_watermark_for_update(cur)
+            cur.execute(f"DELETE FROM {DAILY_TABLE}")
+            cur.execute(f"DELETE FROM {RESOLUTION_TABLE}")
+            sources = ["customer_data"] + ([ARCHIVE_TABLE] if table_exists(cur, ARCHIVE_TABLE) else [])
+            high = 0
+            for source in sources:
+                cur.execute(f"SELECT COALESCE(MAX(query_id), 0) FROM {source}")
+                high = max(high, int(cur.fetchone()[0]))
+            if self.counted_column:
+                # recount what is marked counted (archived rows all are); the rest is left to the catch-up below
+                self._fold(cur, f"{self.counted_column} = 1", (), high, sources[:1])
+                if len(sources) > 1:
+                    self._fold(cur, "query_id <= %s", (high,), high, sources[1:])
+            else:
+                self._fold(cur, "query_id <= %s", (high,), high, sources)
+            conn.commit()
+            cur.close()
+        if self.counted_column:
+            self.catch_up()
+        self.db.mark_written()
+        return high
+
+    def lock_watermark(self, cur):
+        """
+        Share-lock the watermark in the caller's transaction and return it.
+        Take it before locking any customer_data row (the order catch_up uses)
+        so a status change and a catch-up cannot deadlock.
+        """
+        cur.execute(f"SELECT last_query_id FROM {WATERMARK_TABLE} WHERE name = %s LOCK IN SHARE MODE",
+                    (WATERMARK_NAME,))
+        row = cur.fetchone()
+        return int(row[0]) if row else 0
+
+    def apply_status_change(self, cur, watermark, query_id, before, new_status, new_closed_at):
+        """
+        Move one complaint between summary buckets. Call on the cursor of the
+        transaction that updates the row, after lock_watermark(); `before` is
+        its (status, created_at, closed_at) read in that transaction before the UPDATE.
+        """
+        self.apply_status_changes(cur, watermark, [(query_id, before, new_status, new_closed_at)])
+
+    def apply_status_changes(self, cur, watermark, changes):
+        """
+        apply_status_change for many rows: `changes` is a list of
+        (query_id, before, new_status, new_closed_at). Deltas are summed per
+        summary row first, so a bulk update costs one statement per table.
+        """
+        daily, resolution = {}, {}
+        for query_id, before, new_status, new_closed_at in changes:
+            # `before` ends with the analytics_counted flag when the column exists (before_fields)
+            counted = bool(before[3]) if len(before) > 3 else int(query_id) <= watermark
+            if not counted:
+                continue  # not counted yet: the next catch-up counts its final state
+            old_status, created_at, old_closed_at = before[:3]
+            old_status, new_status = old_status or "", new_status or ""
+            created_day = _as_date(created_at) or UNKNOWN_DAY
+
+            if old_status != new_status:
+                for status, delta in ((old_status, -1), (new_status, 1)):
+                    daily[(created_day, status)] = daily.get((created_day, status), 0) + delta
+            if created_at is not None and old_closed_at != new_closed_at:
+                for closed_at, delta in ((old_closed_at, -1), (new_closed_at, 1)):
+                    if closed_at is None:
+                        continue
+                    # whole seconds on both ends, like TIMESTAMPDIFF(SECOND, ...) in the fold
+                    seconds = int((closed_at.replace(microsecond=0) - created_at.replace(microsecond=0)).total_seconds())
+                    count, total = resolution.get(_as_date(closed_at), (0, 0))
+                    resolution[_as_date(closed_at)] = (count + delta, total + delta * seconds)
+
+        daily_rows = [(day, status, delta) for (day, status), delta in daily.items() if delta]
+        if daily_rows:
+            cur.executemany(
+                f"INSERT INTO {DAILY_TABLE} (created_day, status, complaints) VALUES (%s, %s, %s) "
+                f"ON DUPLICATE KEY UPDATE complaints = complaints + VALUES(complaints)",
+                daily_rows
+            )
+        resolution_rows = [(day, count, total) for day, (count, total) in resolution.items() if count or total]
+        if resolution_rows:
+            cur.executemany(
+                f"INSERT INTO {RESOLUTION_TABLE} (closed_day, closed_count, resolution_seconds) "
+                f"VALUES (%s, %s, %s) ON DUPLICATE KEY UPDATE closed_count = closed_count + VALUES(closed_count), "
+                f"resolution_seconds = resolution_seconds + VALUES(resolution_seconds)",
+                resolution_rows
+            )
+
+    # ---------------- reads ----------------
+    def _select(self, sql, params=()):
+        self.ensure_tables()
+        with self.db.read_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+            cur.close()
+        return rows
+
+    def watermark(self):
+        rows = self._select(f"SELECT last_query_id, updated_at FROM {WATERMARK_TABLE} WHERE name = %s",
+                            (WATERMARK_NAME,))
+        return (int(rows[0][0]), rows[0][1]) if rows else (0, None)
+
+    def backlog_by_status(self):
+        """
+        {status: complaints} across all days ('' for NULL statuses).
+        """
+        rows = self._select(f"SELECT status, SUM(complaints) FROM {DAILY_TABLE} GROUP BY status HAVING SUM(complaints) > 0")
+        return {str(status): int(cnt) for status, cnt in rows}
+
+    def age_buckets(self, today=None):
+        """
+        Unresolved complaints per (age bucket, status) as a frame with one
+        column per status, buckets in AGE_BUCKETS order plus 'unknown'.
+        """
+        today = today or date.today()
+        rows = self._select(
+            f"SELECT created_day, status, complaints FROM {DAILY_TABLE} WHERE status <> %s AND complaints > 0",
+            (CLOSED_STATUS,)
+        )
+        counts = {}
+        for created_day, status, cnt in rows:
+            day = _as_date(created_day)
+            bucket = "unknown" if day == UNKNOWN_DAY else age_bucket((today - day).days)
+            counts[(bucket, str(status))] = counts.get((bucket, str(status)), 0) + int(cnt)
+        df = pd.DataFrame([(b, s, c) for (b, s), c in counts.items()], columns=["age", "status", "complaints"])
+        table = df.pivot_table(index="age", columns="status", values="complaints", aggfunc="sum", fill_value=0)
+        labels = [name for _, name in AGE_BUCKETS] + (["unknown"] if "unknown" in table.index else [])
+        return table.reindex(labels, fill_value=0)
+
+    def resolution_by_day(self, days=90, today=None):
+        """
+        Per closing day over the last `days` days: closed count and mean hours to resolve.
+        """
+        since = (today or date.today()) - timedelta(days=days)
+        rows = self._select(
+            f"SELECT closed_day, closed_count, resolution_seconds FROM {RESOLUTION_TABLE} "
+            f"WHERE closed_day >= %s AND closed_count > 0 ORDER BY closed_day",
+            (since,)
+        )
+        df = pd.DataFrame([(_as_date(d), int(n), int(s)) for d, n, s in rows],
+                          columns=["closed_day", "closed", "resolution_seconds"])
+        df["mean_hours"] = (df["resolution_seconds"] / df["closed"].where(df["closed"] > 0) / 3600.0).round(2)
+        return df
+
+
+def main(argv=None):
+    from db import ConnectionManager, load_db_config
+
+    parser = argparse.ArgumentParser(description="Maintain the support analytics summary tables")
+    parser.add_argument("command", choices=["catch-up", "rebuild"])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    db = ConnectionManager(load_db_config(), pool_size=1)
+    try:
+        summary = AnalyticsSummary(db)
+        if args.command == "rebuild":
+            high = summary.rebuild()
+            print(f"Summaries rebuilt up to query_id {high}")
+        else:
+            covered = summary.catch_up()
+            print(f"Folded in {covered} new complaint(s)" if covered else "Summaries already current")
+    finally:
+        db.close_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
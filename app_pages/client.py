@@ -0,0 +1,193 @@
+"""
+Client page: log in, raise a complaint, check the status of your complaints.
+"""
+import uuid
+
+import streamlit as st
+
+from auth import check_client_login
+from services import get_instrumentation, get_store, get_write_queue
+from ui import COMPLAINT_COLUMN_CONFIG, export_buttons
+from validation import missing_required_fields
+
+st.title("Customer Queries Dashboard")
+
+st.session_state.setdefault("client_auth", False)
+st.session_state.setdefault("client_user", "")
+st.session_state.setdefault("client_email", "")
+st.session_state.setdefault("client_mobile", "")
+# part of every submission's idempotency key: the same form sent twice from this session is one complaint
+st.session_state.setdefault("client_session_token", uuid.uuid4().hex)
+st.session_state.setdefault("client_submission", None)  # tracking id of the last Raise Query
+
+# --- Login ---
+if not st.session_state["client_auth"]:
+    st.subheader("🔐 Client Login")
+    with st.form("client_login_form", clear_on_submit=False):
+        uname = st.text_input("Username", key="client_uname")
+        pwd = st.text_input("Password", type="password", key="client_pwd")
+        login_btn = st.form_submit_button("Login")
+
+    if login_btn:
+        profile = check_client_login(uname, pwd)
+        if profile is not None:
+            st.session_state["client_auth"] = True
+            st.session_state["client_user"] = uname
+            st.session_state["client_email"] = profile["email"]
+            st.session_state["client_mobile"] = profile["mobile"]
+            st.rerun()
+        else:
+            st.error("Invalid username or password.")
+    st.stop()
+
+# --- Logged in area ---
+st.markdown(f"**Logged in as:** `{st.session_state['client_user']}`  —  📧 {st.session_state['client_email']}  |  📱 {st.session_state['client_mobile']}")
+if st.button("Logout", key="client_logout_btn"):
+    st.session_state["client_auth"] = False
+    st.session_state["client_user"] = ""
+    st.session_state["client_email"] = ""
+    st.session_state["client_mobile"] = ""
+    st.rerun()
+
+# the database side is only set up once someone is logged in
+instr = get_instrumentation()
+store = get_store()
+write_queue = get_write_queue()
+
+def clear_new_form():
+    # a button callback: the rerun that follows the click shows the empty form
+    for k in ("new_name", "new_email", "new_mobile", "new_query_heading", "new_query_description", "new_checked"):
+        if k in st.session_state:
+            del st.session_state[k]
+    st.session_state["client_submission"] = None
+
+def show_submission_status(tracking_id, contact):
+    status = write_queue.status(tracking_id)
+    if status["state"] == "queued":
+        st.info(f"⏳ Complaint received (tracking id {tracking_id}), saving…")
+        return
+    if status["state"] == "failed":
+        st.error(f"Failed to submit complaint (tracking id {tracking_id}): {status['error']}")
+        return
+    if status["state"] == "unknown":
+        st.warning(f"No record of tracking id {tracking_id} any more; check the status tab.")
+        return
+    new_id = status["query_id"]
+    st.success(f"✔ Complaint registered! (ID: {new_id})")
+
+    # show open complaints for this user
+    df = store.fetch_open_complaints(*contact)
+    if not df.empty:
+        st.subheader("Your Open Complaints (including the new one)")
+        display_cols = [c for c in ["query_id","name","email","mobile","query_heading","query_description","status","created_at","closed_at","remarks"] if c in df.columns]
+        with instr.span("render.client_open"):
+            st.dataframe(df[display_cols], column_config=COMPLAINT_COLUMN_CONFIG)
+    else:
+        st.info("No open complaints found for your contact details (unexpected after insert).")
+
+    st.button("Done", key=f"done_after_{new_id}", on_click=clear_new_form)
+
+@st.fragment(run_every=1.0)
+def poll_submission_status(tracking_id, contact):
+    # re-check every second while queued; a full rerun once it settles stops the polling
+    if write_queue.status(tracking_id)["state"] != "queued":
+        st.rerun()
+    show_submission_status(tracking_id, contact)
+
+def clear_check_fields():
+    # Only clear complaint id and status for the simplified UI
+    # (a button callback: widget values can only be reset before the widgets are drawn)
+    if "chk_complaint_id" in st.session_state:
+        st.session_state["chk_complaint_id"] = ""
+    if "chk_status_choice" in st.session_state:
+        st.session_state["chk_status_choice"] = "all"
+
+# two tabs
+tab_new, tab_check = st.tabs(["New Query", "Check Query Status"])
+
+# New Query tab (unchanged)
+with tab_new:
+    st.header("Raise a New Query")
+    st.info("Fill the form below and click **Raise Query**. New complaints are created with status = 'open'.")
+
+    new_name = st.text_input("Name", key="new_name")
+    new_email = st.text_input("Email", value=st.session_state.get("client_email", ""), key="new_email")
+    new_mobile = st.text_input("Mobile number", value=st.session_state.get("client_mobile", ""), key="new_mobile")
+    # NEW: heading then description
+    new_query_heading = st.text_input("Query Heading", key="new_query_heading")
+    new_query_description = st.text_area("Query Description", key="new_query_description", height=150)
+    new_checked = st.checkbox("I confirm the information is correct", key="new_checked")
+
+    if st.button("Raise Query", key="raise_query_btn"):
+        missing = missing_required_fields({
+            "name": new_name, "email": new_email, "mobile": new_mobile,
+            "query_heading": new_query_heading, "query_description": new_query_description,
+        })
+
+        if missing:
+            st.error("❌ Please fill required fields: " + ", ".join(missing))
+        elif not new_checked:
+            st.error("❌ Please tick the confirmation checkbox.")
+        else:
+            try:
+                # acknowledged at once; a double click maps to the same tracking id
+                st.session_state["client_submission"] = write_queue.submit({
+                    "name": new_name, "email": new_email, "mobile": new_mobile,
+                    "query_heading": new_query_heading, "query_description": new_query_description,
+                }, st.session_state["client_session_token"])
+                st.session_state["client_submission_contact"] = (new_email, new_mobile)
+            except Exception as e:
+                st.error(f"Failed to submit complaint: {e}")
+                st.stop()
+
+    tracking_id = st.session_state["client_submission"]
+    if tracking_id:
+        contact = st.session_state.get("client_submission_contact", (new_email, new_mobile))
+        if write_queue.status(tracking_id)["state"] == "queued":
+            poll_submission_status(tracking_id, contact)
+        else:
+            show_submission_status(tracking_id, contact)
+
+# Check Query Status tab (SIMPLIFIED)
+with tab_check:
+    st.header("Check Query Status")
+    st.info("We assure you that all your queries will be resolved soon.")
+
+    # Only show status and complaint id filters
+    status_choice = st.selectbox("Filter by status", options=["all", "open", "In Progress", "closed"], index=0, key="chk_status_choice")
+    complaint_id_filter = st.text_input("Filter by Complaint ID (optional)", key="chk_complaint_id")
+
+    if st.button("Check Status", key="check_status_btn"):
+        # default to logged-in user's email/mobile
+        email_val = st.session_state.get("client_email", "") or None
+        mobile_val = st.session_state.get("client_mobile", "") or None
+
+        # Complaint ID filter if provided (applied in SQL with the other filters)
+        cid = None
+        if str(complaint_id_filter).strip():
+            try:
+                cid = int(str(complaint_id_filter).strip())
+            except ValueError:
+                st.error("Complaint ID must be a number. Please enter a valid numeric ID.")
+                st.stop()
+
+        try:
+            df_chk = store.fetch_complaints_lookup(None, email_val, mobile_val, status_choice, cid)
+        except Exception as e:
+            st.error(f"Lookup failed: {e}")
+            st.stop()
+
+        if cid is not None and df_chk.empty:
+            st.info(f"No complaints found matching Complaint ID {cid} for your account.")
+
+        if df_chk.empty:
+            st.info("No complaints found.")
+        else:
+            st.subheader("Matching Complaints")
+            display_cols = [c for c in ["query_id","name","email","mobile","query_heading","query_description","status","created_at","closed_at","remarks"] if c in df_chk.columns]
+            with instr.span("render.client_lookup"):
+                st.dataframe(df_chk[display_cols], column_config=COMPLAINT_COLUMN_CONFIG)
+            export_buttons("client_export", "lookup",
+                           store.lookup_export_sql(None, email_val, mobile_val, status_choice, cid))
+
+            st.button("Clear Filters", key="clear_lookup_btn", on_click=clear_check_fields)
\ No newline at end of file
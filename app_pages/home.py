@@ -0,0 +1,6 @@
+"""
+Landing page. Needs no database, so opening the app does not load data_access / pandas.
+"""
+import streamlit as st
+
+st.write("Choose **Client** to raise or track a complaint, or **Support** to work the complaint list.")
@@ -0,0 +1,512 @@
+"""
+Support page: complaint list, bulk actions, analytics, pool health and diagnostics.
+"""
+from datetime import datetime
+
+import streamlit as st
+
+from auth import check_support_login
+from services import get_db, get_instrumentation, get_plan_warnings, get_store, get_write_queue
+from ui import COMPLAINT_COLUMN_CONFIG, export_buttons
+
+st.title("Support Dashboard")
+
+st.session_state.setdefault("support_auth", False)
+st.session_state.setdefault("support_user", "")
+st.session_state.setdefault("support_selected_id", None)
+st.session_state.setdefault("support_status_filter", "all")
+st.session_state.setdefault("support_page_size", 50)
+st.session_state.setdefault("support_page_cursors", [None])
+st.session_state.setdefault("support_page_key", None)
+st.session_state.setdefault("support_page_cache", None)
+st.session_state.setdefault("support_status_counts", None)
+st.session_state.setdefault("support_status_counts_at", None)
+st.session_state.setdefault("support_flash", None)
+
+# Login form
+if not st.session_state["support_auth"]:
+    st.subheader("🔐 Support Login Required")
+    with st.form("support_login_form"):
+        username = st.text_input("Username", key="support_username")
+        password = st.text_input("Password", type="password", key="support_password")
+        login_clicked = st.form_submit_button("Login", use_container_width=True)
+
+    if login_clicked:
+        if check_support_login(username, password):
+            st.session_state["support_auth"] = True
+            st.session_state["support_user"] = username
+            st.success("Login successful.")
+        else:
+            st.error("Invalid username or password.")
+
+    if not st.session_state["support_auth"]:
+        st.stop()
+
+st.markdown(f"**Logged in as:** `{st.session_state['support_user']}`")
+if st.button("Logout", key="support_logout_btn"):
+    st.session_state["support_auth"] = False
+    st.session_state["support_user"] = ""
+    st.session_state["support_selected_id"] = None
+    st.rerun()
+
+# pandas, data_access and analytics only load once someone is logged in
+import pandas as pd  # noqa: E402
+from analytics import CLOSED_STATUS  # noqa: E402
+from data_access import SUPPORT_PAGE_SIZES, REMARKS_PLACEHOLDERS, feed_horizon, load_feed_settings  # noqa: E402
+from shaping import format_value, index_by_query_id, drop_seen_changes, merge_changed_rows, move_status_count  # noqa: E402
+
+instr = get_instrumentation()
+db = get_db()
+store = get_store()
+write_queue = get_write_queue()
+plan_warnings = get_plan_warnings()
+feed_settings = load_feed_settings()
+
+# Analytics only runs while its tab is selected (on_change="rerun" enables .open)
+tab_complaints, tab_analytics = st.tabs(["📌 Complaints", "📊 Analytics"], key="support_tab", on_change="rerun")
+
+with tab_complaints:
+    # Page rows and status counts are kept in session state: changing the selected
+    # complaint reruns the script without touching the database, and an update
+    # patches just the changed row. "Refresh" drops both and reloads.
+    def refresh_support_view():
+        st.session_state["support_page_cache"] = None
+        st.session_state["support_status_counts"] = None
+
+    st.button("🔄 Refresh", key="support_refresh_btn", on_click=refresh_support_view)
+
+    # --- Status filter (options + counts from one GROUP BY) + page size ---
+    if st.session_state["support_status_counts"] is None:
+        try:
+            st.session_state["support_status_counts"] = store.fetch_status_counts()
+            st.session_state["support_status_counts_at"] = datetime.now()
+        except Exception as e:
+            st.error(f"Database fetch error: {e}")
+            st.stop()
+    status_counts = st.session_state["support_status_counts"]
+    status_options = ["all"] + sorted(v for v in status_counts if v is not None)
+
+    col_f, col_s = st.columns([3, 1])
+    with col_f:
+        status_filter = st.selectbox(
+            "Filter by status",
+            options=status_options,
+            index=status_options.index(st.session_state["support_status_filter"]) if st.session_state["support_status_filter"] in status_options else 0,
+            format_func=lambda s: f"{s} ({sum(status_counts.values()) if s == 'all' else status_counts.get(s, 0)})",
+            key="support_status_selectbox"
+        )
+    with col_s:
+        page_size = st.selectbox(
+            "Rows per page",
+            options=SUPPORT_PAGE_SIZES,
+            index=SUPPORT_PAGE_SIZES.index(st.session_state["support_page_size"]) if st.session_state["support_page_size"] in SUPPORT_PAGE_SIZES else 1,
+            key="support_page_size_selectbox"
+        )
+    st.session_state["support_status_filter"] = status_filter
+    st.session_state["support_page_size"] = page_size
+
+    # keyword search (heading / description / remarks); results are ranked, paged the same way
+    search_text = st.text_input("🔎 Search complaints", key="support_search_text",
+                                placeholder="e.g. refund, login failed").strip()
+
+    # start over from page 1 whenever the search, filter or page size changes
+    if st.session_state["support_page_key"] != (search_text, status_filter, page_size):
+        st.session_state["support_page_key"] = (search_text, status_filter, page_size)
+        st.session_state["support_page_cursors"] = [None]
+
+    # support_page_cursors[i] is the cursor that starts page i+1
+    # (a keyset cursor for the list, a row offset for search results)
+    page_cursors = st.session_state["support_page_cursors"]
+    page_no = len(page_cursors)
+
+    page_key = (search_text, status_filter, page_size, page_cursors[-1])
+    page_cache = st.session_state["support_page_cache"]
+    if page_cache is None or page_cache["key"] != page_key:
+        try:
+            # change-feed watermark first, so nothing written during the page read is missed
+            feed_since = store.fetch_feed_watermark() if store.has_updated_at() else None
+            if search_text:
+                df_page, next_cursor, remarks_present = store.search_complaints(search_text, status_filter, page_size, page_cursors[-1])
+            else:
+                df_page, next_cursor, remarks_present = store.fetch_support_page(status_filter, page_size, page_cursors[-1])
+        except Exception as e:
+            st.error(f"Database fetch error: {e}")
+            st.stop()
+        df_page = index_by_query_id(df_page)
+        # last status seen per complaint, so a change can move the status counts without a recount
+        known_status = {int(qid): (None if pd.isna(s) else str(s)) for qid, s in zip(df_page.index, df_page["status"])}
+        page_cache = {"key": page_key, "df": df_page,
+                      "next_cursor": next_cursor, "remarks_present": remarks_present,
+                      "feed_since": feed_since, "feed_seen": {}, "new_ids": set(), "known_status": known_status}
+        st.session_state["support_page_cache"] = page_cache
+    next_cursor = page_cache["next_cursor"]
+    remarks_present = page_cache["remarks_present"]
+
+    # --- Live updates: poll the updated_at change feed and merge only the changed rows ---
+    def belongs_on_this_page(row):
+        # new arrivals sort first, so they only join page 1 of the unsearched list
+        if search_text or page_no != 1 or status_filter not in ("all", row["status"]):
+            return False
+        if next_cursor is None or next_cursor[0] is None:
+            return True
+        return pd.notna(row["created_at"]) and (row["created_at"], row["query_id"]) > next_cursor
+
+    def merge_feed_changes(cache, changes):
+        # O(changed rows): merge them into the page and move the status counts from each row's last known status
+        changes = index_by_query_id(changes)
+        cache["df"], added, _ = merge_changed_rows(cache["df"], changes, belongs_on_this_page)
+        cache["new_ids"].update(added)
+        counts = st.session_state["support_status_counts"]
+        counted_at = st.session_state["support_status_counts_at"]
+        known = cache["known_status"]
+        recount = False
+        for qid, status, created_at in zip(changes.index, changes["status"], changes["created_at"]):
+            status = None if pd.isna(status) else str(status)
+            if qid in known:
+                if counts is not None:
+                    move_status_count(counts, known[qid], status)
+            elif counted_at is not None and pd.notna(created_at) and created_at >= counted_at:
+                # created after the counts were taken: a new complaint
+                if counts is not None:
+                    counts[status] = counts.get(status, 0) + 1
+            else:
+                recount = True  # an older complaint whose previous status this page never saw
+            known[qid] = status
+        if recount:
+            # not forced: the counts are reloaded on this session's next full rerun
+            st.session_state["support_status_counts"] = None
+
+    def show_complaint_table():
+        df_view = page_cache["df"]
+        if df_view.empty and page_no == 1:
+            st.info(f"No complaints match '{search_text}'." if search_text else "No complaints found.")
+            return
+        st.subheader("📌 Complaints")
+        display_cols = [c for c in ["query_id","name","email","mobile","query_heading","query_description","status","created_at","closed_at","remarks"] if c in df_view.columns]
+        new_ids = page_cache["new_ids"] & set(df_view.index)
+        table = df_view[display_cols]
+        if new_ids:
+            table = table.style.apply(
+                lambda row: ["background-color: rgba(255, 214, 10, 0.25)" if row.name in new_ids else ""] * len(row),
+                axis=1)
+        with instr.span("render.support_list"):
+            st.dataframe(table, column_config=COMPLAINT_COLUMN_CONFIG, hide_index=True)
+        if new_ids:
+            col_new, col_clear = st.columns([3, 1])
+            col_new.caption(f"✨ {len(new_ids)} new complaint(s) since this page was loaded are highlighted.")
+            col_clear.button("Clear highlights", key="support_clear_new_btn",
+                             on_click=lambda: page_cache["new_ids"].clear())
+
+    # the poll reruns only this fragment: it merges the changes and redraws the table in place
+    @st.fragment(run_every=feed_settings["poll_seconds"])
+    def poll_changes():
+        instr.begin_run("Support feed")
+        cache = st.session_state["support_page_cache"]
+        try:
+            changes, cache["feed_since"] = store.fetch_changes(cache["feed_since"])
+        except Exception as e:
+            st.caption(f"Live updates paused: {e}")
+        else:
+            horizon = feed_horizon(cache["feed_since"])
+            changes, cache["feed_seen"] = drop_seen_changes(changes, cache["feed_seen"], horizon)
+            st.caption(f"🟢 Live — checked {datetime.now():%H:%M:%S}")
+            if not changes.empty:
+                merge_feed_changes(cache, changes)
+        show_complaint_table()
+
+    live = False
+    if store.has_updated_at():
+        live = st.toggle("Live updates", value=True, key="support_live_updates",
+                         help=f"Checks for new and changed complaints every {feed_settings['poll_seconds']:.0f}s")
+    else:
+        st.caption("Live updates need the updated_at column (run `python schema.py migrate`).")
+    if live:
+        poll_changes()
+    else:
+        show_complaint_table()
+    df_view = page_cache["df"]
+
+    if not (df_view.empty and page_no == 1):
+        total = sum(status_counts.values()) if status_filter == "all" else status_counts.get(status_filter, 0)
+        total_pages = max(1, -(-total // page_size))
+        nav_prev, nav_info, nav_next = st.columns([1, 2, 1])
+        # callbacks run before the rerun, so the new page renders on the same click
+        def go_prev_page():
+            st.session_state["support_page_cursors"] = page_cursors[:-1]
+
+        def go_next_page():
+            st.session_state["support_page_cursors"] = page_cursors + [next_cursor]
+
+        with nav_prev:
+            st.button("◀ Previous", key="support_prev_page_btn", disabled=page_no <= 1, on_click=go_prev_page)
+        with nav_info:
+            if search_text:
+                st.caption(f"Page {page_no} — best matches first")
+            else:
+                st.caption(f"Page {page_no} of {total_pages} — {total} complaint(s)")
+        with nav_next:
+            st.button("Next ▶", key="support_next_page_btn", disabled=next_cursor is None, on_click=go_next_page)
+
+        st.caption("Export this view (all pages):")
+        export_buttons("support_export", "search" if search_text else str(status_filter).replace(" ", "_"),
+                       store.support_export_sql(status_filter, search_text))
+
+        if remarks_present:
+            st.caption("Remarks column is shown. Click a complaint below to view/edit full remarks.")
+
+        # --- Bulk actions: tick rows on this page, apply one status / remarks template in one transaction ---
+        def apply_bulk_update(query_ids):
+            new_status = st.session_state["support_bulk_status"]
+            try:
+                updated, failures = store.bulk_update_status(
+                    query_ids, new_status, st.session_state.get("support_bulk_remarks", ""),
+                    append_remarks=st.session_state.get("support_bulk_append", False))
+            except ValueError as e:
+                # the remarks template was rejected up front
+                st.session_state["support_bulk_result"] = ("error", f"Bulk update not applied: {e}", {})
+                return
+            except Exception as e:
+                st.session_state["support_bulk_result"] = ("error", f"Bulk update failed, nothing was changed: {e}", {})
+                return
+            st.session_state["support_bulk_result"] = (
+                "success", f"Set {len(updated)} complaint(s) to '{new_status}'.", failures)
+            refresh_support_view()  # one reload for the whole batch
+
+        with st.expander("☑️ Bulk actions", expanded=bool(st.session_state.get("support_bulk_result"))):
+            bulk_result = st.session_state.pop("support_bulk_result", None)
+            if bulk_result:
+                (st.success if bulk_result[0] == "success" else st.error)(bulk_result[1])
+                if bulk_result[2]:
+                    st.warning(f"{len(bulk_result[2])} complaint(s) were not updated:")
+                    st.dataframe(pd.DataFrame({"query_id": list(bulk_result[2]), "reason": list(bulk_result[2].values())}),
+                                 hide_index=True)
+            bulk_cols = [c for c in ["query_id", "name", "query_heading", "status", "created_at"] if c in df_view.columns]
+            picker = df_view[bulk_cols].copy()
+            picker.insert(0, "select", False)
+            # keyed on the page's rows, so a reload or live merge never carries ticks over to other rows
+            picked = st.data_editor(
+                picker, hide_index=True, disabled=bulk_cols, column_config=COMPLAINT_COLUMN_CONFIG,
+                key=f"support_bulk_editor_{hash(tuple(df_view.index))}")
+            bulk_ids = [int(q) for q in picked.loc[picked["select"], "query_id"]]
+
+            col_bs, col_ba = st.columns([1, 2])
+            with col_bs:
+                st.selectbox("New status", options=["open", "In Progress", "closed"], key="support_bulk_status")
+            with col_ba:
+                st.checkbox("Append to existing remarks", key="support_bulk_append", disabled=not remarks_present)
+            st.text_area("Remarks template (optional, leave empty to keep remarks)", key="support_bulk_remarks",
+                         disabled=not remarks_present, height=80,
+                         placeholder="e.g. Closed as duplicate on {date} ({old_status} → {status})",
+                         help="Placeholders: " + ", ".join("{" + p + "}" for p in REMARKS_PLACEHOLDERS))
+            st.button(f"Apply to {len(bulk_ids)} selected", key="support_bulk_apply_btn", disabled=not bulk_ids,
+                      on_click=apply_bulk_update, args=(bulk_ids,))
+
+        # Manage a complaint
+        st.subheader("Manage a complaint")
+        flash = st.session_state["support_flash"]
+        if flash:
+            (st.success if flash[0] == "success" else st.error)(flash[1])
+            st.session_state["support_flash"] = None
+        id_options = [str(qid) for qid in df_view.index]
+        if not id_options:
+            st.info("No complaints in this filter.")
+        else:
+            if st.session_state["support_selected_id"] not in id_options:
+                st.session_state["support_selected_id"] = id_options[0]
+
+            selected_id = st.selectbox(
+                "Select Complaint ID",
+                options=id_options,
+                index=id_options.index(st.session_state["support_selected_id"]),
+                key="support_id_selectbox"
+            )
+            st.session_state["support_selected_id"] = selected_id
+
+            sel_row = df_view.loc[int(selected_id)]
+
+            # Friendly details
+            st.markdown("**Complaint details:**")
+            detail_cols = [c for c in ["query_id","name","email","mobile","query_heading","query_description","status","created_at","closed_at"] if c in df_view.columns]
+            for col in detail_cols:
+                st.write(f"**{col}:** {format_value(sel_row[col])}")
+
+            # Show remarks in expander for reading
+            if remarks_present:
+                current_remarks = sel_row["remarks"] if pd.notna(sel_row["remarks"]) else ""
+                with st.expander("Remarks (visible to client) — click to expand"):
+                    if current_remarks.strip():
+                        st.write(current_remarks)
+                    else:
+                        st.info("No remarks for this complaint.")
+
+            # Editable remarks input (pre-filled)
+            existing_remarks = sel_row["remarks"] if (remarks_present and "remarks" in sel_row.index and pd.notna(sel_row["remarks"])) else ""
+            st.text_area("Edit Remarks (visible to client)", value=existing_remarks, height=120, key=f"remarks_{selected_id}")
+
+            # Current status
+            current_status = sel_row["status"] if "status" in sel_row.index else "open"
+            st.write(f"Current status: **{current_status}**")
+
+            # Build status options (include any custom status)
+            status_radio_options = ["open", "In Progress", "closed"]
+            if "status" in sel_row.index and str(sel_row["status"]) not in status_radio_options:
+                status_radio_options.insert(0, str(sel_row["status"]))
+            try:
+                default_idx = status_radio_options.index(str(current_status))
+            except ValueError:
+                default_idx = 0
+
+            st.radio(
+                "Set new status:",
+                options=status_radio_options,
+                index=default_idx,
+                key=f"support_new_status_radio_{selected_id}"
+            )
+
+            def apply_status_update(query_id, old_row):
+                # runs as a button callback: write, then refresh only this row in the cached page
+                new_status = st.session_state[f"support_new_status_radio_{query_id}"]
+                remarks = st.session_state.get(f"remarks_{query_id}", "")
+                try:
+                    store.update_complaint_status(query_id, new_status, remarks, old_row)
+                    fresh = store.fetch_complaint(query_id)
+                except Exception as e:
+                    st.session_state["support_flash"] = ("error", f"Update failed: {e}")
+                    return
+                cache = st.session_state["support_page_cache"]
+                if not fresh.empty and cache is not None and query_id in cache["df"].index:
+                    cache["df"].loc[query_id] = fresh.iloc[0]
+                    cache["known_status"][int(query_id)] = new_status
+                    if "updated_at" in fresh.columns:
+                        # already merged: the change feed need not pick this write up again
+                        cache["feed_seen"][int(query_id)] = fresh["updated_at"].iloc[0]
+                counts = st.session_state["support_status_counts"]
+                if counts is not None:
+                    move_status_count(counts, old_row.get("status"), new_status)
+                st.session_state["support_flash"] = (
+                    "success", f"Status for ID {query_id} set to '{new_status}' and remarks saved (if available).")
+
+            # Update button (delete removed per your request)
+            col1, col2 = st.columns(2)
+            with col1:
+                old_row = {c: sel_row[c] for c in ("query_id", "name", "email", "mobile", "status") if c in sel_row.index}
+                st.button("Update Status", key=f"support_update_btn_{selected_id}",
+                          on_click=apply_status_update, args=(int(selected_id), old_row))
+            with col2:
+                st.write("")  # placeholder to keep layout consistent
+
+# --- Analytics: reads the summary tables (analytics.py), never customer_data ---
+if tab_analytics.open:
+    with tab_analytics:
+        analytics = store.analytics
+        analytics_days = st.selectbox("Resolution window (days)", options=[30, 90, 365], index=1,
+                                      key="support_analytics_days")
+        try:
+            analytics.catch_up()  # fold in rows written by ingest.py / other tools
+            backlog = analytics.backlog_by_status()
+            ages = analytics.age_buckets()
+            resolution = analytics.resolution_by_day(days=analytics_days)
+            watermark, summarized_at = analytics.watermark()
+        except Exception as e:
+            st.error(f"Analytics unavailable: {e}")
+        else:
+            unresolved = {s: c for s, c in backlog.items() if s.lower() != CLOSED_STATUS}
+            closed_total = int(resolution["closed"].sum())
+            m_backlog, m_closed, m_mean = st.columns(3)
+            m_backlog.metric("Open backlog", sum(unresolved.values()))
+            m_closed.metric(f"Closed (last {analytics_days} days)", closed_total)
+            m_mean.metric("Mean time to close",
+                          f"{resolution['resolution_seconds'].sum() / closed_total / 3600:.1f} h" if closed_total else "—")
+
+            st.markdown("**Backlog by status**")
+            if unresolved:
+                st.bar_chart(pd.Series(unresolved, name="complaints"), sort=False)
+            else:
+                st.caption("No unresolved complaints.")
+
+            st.markdown("**Age of unresolved complaints**")
+            if not ages.empty and len(ages.columns):
+                st.bar_chart(ages, sort=False, stack=True)
+                st.dataframe(ages)
+            else:
+                st.caption("No unresolved complaints.")
+
+            st.markdown(f"**Mean hours to close, by day closed (last {analytics_days} days)**")
+            if not resolution.empty:
+                st.line_chart(resolution.set_index("closed_day")["mean_hours"])
+            else:
+                st.caption("No complaints closed in this window.")
+
+            st.caption(f"Summaries cover query_id ≤ {watermark}"
+                       + (f" (last folded {format_value(summarized_at)})." if summarized_at else "."))
+
+        def rebuild_analytics():
+            try:
+                analytics.rebuild()
+                st.session_state["support_analytics_flash"] = ("success", "Analytics summaries rebuilt.")
+            except Exception as e:
+                st.session_state["support_analytics_flash"] = ("error", f"Rebuild failed: {e}")
+
+        st.button("Rebuild summaries from scratch", key="support_analytics_rebuild_btn", on_click=rebuild_analytics)
+        analytics_flash = st.session_state.pop("support_analytics_flash", None)
+        if analytics_flash:
+            (st.success if analytics_flash[0] == "success" else st.error)(analytics_flash[1])
+
+# --- Connection pool health / metrics ---
+with st.expander("Database connection pool"):
+    st.json(db.stats())
+    st.caption("Complaint write queue")
+    st.json(write_queue.stats())
+    for w in plan_warnings:
+        st.warning(w)
+    if st.button("Run health check", key="support_db_health_btn"):
+        ok, latency_ms, err = db.health_check()
+        if ok:
+            st.success(f"Database reachable ({latency_ms:.1f} ms)")
+        else:
+            st.error(f"Database health check failed: {err}")
+        for index, ok, latency_ms, err in db.replica_health():
+            if ok:
+                st.success(f"Replica {index} reachable ({latency_ms:.1f} ms)")
+            else:
+                st.error(f"Replica {index} health check failed: {err}")
+
+# --- Hidden diagnostics (open the Support page with ?diag=1) ---
+if st.query_params.get("diag") == "1":
+    st.subheader("🩺 Diagnostics")
+    snap = instr.snapshot()
+
+    st.markdown("**Recent reruns** (newest first)")
+    runs = list(reversed(snap["runs"]))[:20]
+    st.dataframe(pd.DataFrame([{"started_at": r["started_at"], "page": r["label"],
+                                "total_ms": r["total_ms"], "spans": len(r["spans"])} for r in runs]),
+                 hide_index=True)
+    if runs:
+        run_idx = st.selectbox("Span breakdown for rerun", options=list(range(len(runs))),
+                               format_func=lambda i: f"{runs[i]['started_at']} — {runs[i]['label']} ({runs[i]['total_ms']} ms)",
+                               key="diag_run_select")
+        st.dataframe(pd.DataFrame(runs[run_idx]["spans"]), hide_index=True)
+
+    st.markdown("**Queries** (by total time)")
+    query_rows = [dict(sql=k, **v) for k, v in snap["queries"].items()]
+    query_rows.sort(key=lambda q: q["execute_ms"] + q["fetch_ms"], reverse=True)
+    st.dataframe(pd.DataFrame(query_rows), hide_index=True)
+
+    st.markdown(f"**Slow queries** (≥ {snap['slow_query_ms']:.0f} ms)")
+    if snap["slow_queries"]:
+        st.dataframe(pd.DataFrame(list(reversed(snap["slow_queries"]))), hide_index=True)
+    else:
+        st.caption("None recorded.")
+
+    st.markdown("**Spans**")
+    st.dataframe(pd.DataFrame([dict(span=k, **v) for k, v in snap["spans"].items()]), hide_index=True)
+
+    col_exp, col_reset = st.columns(2)
+    with col_exp:
+        if st.button("Export metrics (JSON + Prometheus)", key="diag_export_btn"):
+            pool_gauges = {f"cq_pool_{k}": v for k, v in db.stats().items()}
+            json_path, prom_path = instr.export(extra_gauges=pool_gauges)
+            st.success(f"Written {json_path} and {prom_path}")
+    with col_reset:
+        if st.button("Reset counters", key="diag_reset_btn"):
+            instr.reset()
\ No newline at end of file
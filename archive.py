@@ -0,0 +1,285 @@
+"""
+Archive for closed complaints (customer_data_archive).
+
+Closed complaints used to stay in customer_data forever, so every Support
+list, status count and lookup paid for all of history. The archive job moves
+complaints closed more than CQ_ARCHIVE_AFTER_DAYS days ago (default 90) into
+customer_data_archive, a compressed InnoDB table range-partitioned by the
+month of closed_at: a month is one partition that can later be dropped or
+exported as a whole, and the hot table only holds what agents work on.
+
+Readers include the archive only when closed complaints are asked for
+(status filter "closed" or "all", see data_access.py). Updating an archived
+complaint (e.g. reopening it) first moves it back into customer_data
+(restore_archived). The analytics summaries keep counting archived
+complaints; AnalyticsSummary.rebuild() reads both tables. Every archived
+complaint is closed, so the Support status counts only need how many there
+are: customer_data_archive_count holds that number, changed in the same
+transaction as every move in either direction.
+
+The job runs by hand or from a scheduler, never on app start:
+
+    python archive.py run [--days N]        # batches of CQ_ARCHIVE_BATCH (default 1000) rows
+    python archive.py restore ID [ID ...]
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+from analytics import CLOSED_STATUS, COUNTED_COLUMN
+from schema import ARCHIVE_COUNT_TABLE, ARCHIVE_TABLE, SchemaInspector, table_exists
+
+log = logging.getLogger(__name__)
+
+# columns kept in the archive (the hot table's remarks may be missing: archived as NULL)
+ARCHIVE_COLUMNS = ("query_id", "name", "email", "mobile", "query_heading", "query_description",
+                   "status", "created_at", "closed_at", "remarks")
+# catch-all partitions either side of the monthly ones
+FIRST_PARTITION = "p_start"
+LAST_PARTITION = "p_future"
+
+
+def load_archive_settings():
+    return {
+        "after_days": int(os.environ.get("CQ_ARCHIVE_AFTER_DAYS", "90")),
+        "batch_size": int(os.environ.get("CQ_ARCHIVE_BATCH", "1000")),
+    }
+
+
+def _month(value):
+    day = value.date() if isinstance(value, datetime) else date.fromisoformat(str(value)[:10])
+    return day.replace(day=1)
+
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def _in_list(ids):
+    return ", ".join(["%s"] * len(ids))
+
+
+def restore_archived(cur, query_ids, hot_columns, table="customer_data"):
+    """
+    Move archived complaints back into `table` on the caller's cursor (inside
+    its transaction). `hot_columns` are the table's columns (SchemaInspector).
+    Returns the number of complaints restored; ids not in the archive are ignored.
+    """
+    query_ids = [int(q) for q in query_ids]
+    if not query_ids:
+        return 0
+    cols = [c for c in ARCHIVE_COLUMNS if c in hot_columns]
+    insert_cols, select_cols = list(cols), list(cols)
+    if "updated_at" in hot_columns:
+        # a restore is a change: the Support change feed picks the row up again
+        insert_cols.append("updated_at")
+        select_cols.append("CURRENT_TIMESTAMP(6)")
+    if COUNTED_COLUMN in hot_columns:
+        # archived complaints stay in the analytics summaries, so they come back counted
+        insert_cols.append(COUNTED_COLUMN)
+        select_cols.append("1")
+    cur.execute(
+        f"INSERT INTO {table} ({', '.join(insert_cols)}) SELECT {', '.join(select_cols)} "
+        f"FROM {ARCHIVE_TABLE} WHERE query_id IN ({_in_list(query_ids)})", tuple(query_ids)
+    )
+    restored = cur.rowcount or 0
+    if restored > 0:
+        cur.execute(f"DELETE FROM {ARCHIVE_TABLE} WHERE query_id IN ({_in_list(query_ids)})", tuple(query_ids))
+        _count_archived(cur, -restored)
+    return restored
+
+
+def _count_archived(cur, delta):
+    cur.execute(f"UPDATE {ARCHIVE_COUNT_TABLE} SET archived = archived + %s WHERE name = %s", (int(delta), ARCHIVE_TABLE))
+
+
+class ComplaintArchive:
+    """
+    Creates customer_data_archive and moves closed complaints into and out of it.
+    """
+
+    def __init__(self, db, schema=None, table="customer_data"):
+        self.db = db
+        self.table = table
+        self.schema = schema or SchemaInspector(db, table)
+
+    # ---------------- setup ----------------
+    def ensure_table(self):
+        """
+        Create the archive table if missing. query_id stays unique in practice
+        but the primary key has to include the partitioning column.
+        Returns True if the table was created.
+
+        The row counter is created first, so a reader that sees the archive
+        always finds its count too.
+        """
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {ARCHIVE_COUNT_TABLE} (
+                    name VARCHAR(64) NOT NULL PRIMARY KEY,
+                    archived BIGINT NOT NULL
+                )
+            """)
+            if table_exists(cur, ARCHIVE_TABLE):
+                # counted once if the archive predates its counter
+                cur.execute(f"INSERT IGNORE INTO {ARCHIVE_COUNT_TABLE} (name, archived) "
+                            f"SELECT %s, COUNT(*) FROM {ARCHIVE_TABLE}", (ARCHIVE_TABLE,))
+                cur.close()
+                return False
+            cur.execute(f"INSERT IGNORE INTO {ARCHIVE_COUNT_TABLE} (name, archived) VALUES (%s, 0)", (ARCHIVE_TABLE,))
+            cur.execute(f"""
+                CREATE TABLE {ARCHIVE_TABLE} (
+                    query_id BIGINT NOT NULL,
+                    name VARCHAR(255),
+                    email VARCHAR(255),
+                    mobile VARCHAR(32),
+                    query_heading VARCHAR(255),
+                    query_description TEXT,
+                    status VARCHAR(50),
+                    created_at DATETIME NULL,
+                    closed_at DATETIME NOT NULL,
+                    remarks TEXT NULL,
+                    archived_at DATETIME NOT NULL,
+                    PRIMARY KEY (query_id, closed_at),
+                    KEY idx_cda_email_created (email, created_at),
+                    KEY idx_cda_mobile_created (mobile, created_at),
+                    KEY idx_cda_created_id (created_at, query_id)
+                ) ROW_FORMAT=COMPRESSED
+                PARTITION BY RANGE COLUMNS (closed_at) (
+                    PARTITION {FIRST_PARTITION} VALUES LESS THAN ('2000-01-01'),
+                    PARTITION {LAST_PARTITION} VALUES LESS THAN (MAXVALUE)
+                )
+            """)
+            cur.close()
+        self.schema.refresh()
+        return True
+
+    def ensure_partitions(self, first_month, last_month):
+        """
+        Split monthly partitions for [first_month, last_month] off p_future
+        (months below the newest existing partition already have a home).
+        Returns the partitions added.
+        """
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (ARCHIVE_TABLE,))
+                existing = {r[0] for r in cur.fetchall() if r[0]}
+            except Exception as e:
+                log.info("%s partitions not managed: %s", ARCHIVE_TABLE, e)
+                existing = set()
+            if LAST_PARTITION not in existing:
+                cur.close()
+                return []
+            months = sorted(datetime.strptime(p[1:], "%Y%m").date() for p in existing if p[1:].isdigit())
+            month = max(first_month, _next_month(months[-1])) if months else first_month
+            added = []
+            while month <= last_month:
+                added.append(month)
+                month = _next_month(month)
+            if added:
+                parts = ", ".join(f"PARTITION {partition_name(m)} VALUES LESS THAN ('{_next_month(m):%Y-%m-%d}')"
+                                  for m in added)
+                cur.execute(f"ALTER TABLE {ARCHIVE_TABLE} REORGANIZE PARTITION {LAST_PARTITION} INTO "
+                            f"({parts}, PARTITION {LAST_PARTITION} VALUES LESS THAN (MAXVALUE))")
+            cur.close()
+        return [partition_name(m) for m in added]
+
+    # ---------------- moves ----------------
+    def archive_closed(self, after_days=90, batch_size=1000):
+        """
+        Move complaints closed more than `after_days` days ago into the
+        archive, oldest first, one transaction per batch. Returns the count moved.
+        """
+        self.ensure_table()
+        cutoff = datetime.now() - timedelta(days=int(after_days))
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT MIN(closed_at), MAX(closed_at) FROM {self.table} "
+                        f"WHERE status = %s AND closed_at < %s", (CLOSED_STATUS, cutoff))
+            oldest, newest = cur.fetchone()
+            cur.close()
+        if oldest is None:
+            return 0
+        # DDL commits implicitly, so partitions are added before the moves start
+        self.ensure_partitions(_month(oldest), _month(newest))
+
+        hot_columns = self.schema.capabilities()["columns"]
+        select_cols = ", ".join(c if c in hot_columns else f"NULL AS {c}" for c in ARCHIVE_COLUMNS)
+        # the summaries keep counting archived rows, so only rows already counted move (the rest wait a run)
+        counted = f" AND {COUNTED_COLUMN} = 1" if COUNTED_COLUMN in hot_columns else ""
+        moved = 0
+        while True:
+            with self.db.connection() as conn:
+                conn.start_transaction()
+                cur = conn.cursor()
+                cur.execute(f"SELECT query_id FROM {self.table} WHERE status = %s AND closed_at < %s{counted} "
+                            f"ORDER BY closed_at, query_id LIMIT %s FOR UPDATE", (CLOSED_STATUS, cutoff, int(batch_size)))
+                ids = [int(r[0]) for r in cur.fetchall()]
+                if ids:
+                    cur.execute(
+                        f"INSERT INTO {ARCHIVE_TABLE} ({', '.join(ARCHIVE_COLUMNS)}, archived_at) "
+                        f"SELECT {select_cols}, %s FROM {self.table} WHERE query_id IN ({_in_list(ids)})",
+                        (datetime.now().replace(microsecond=0),) + tuple(ids)
+                    )
+                    cur.execute(f"DELETE FROM {self.table} WHERE query_id IN ({_in_list(ids)})", tuple(ids))
+                    _count_archived(cur, len(ids))
+                conn.commit()
+                cur.close()
+            moved += len(ids)
+            if ids:
+                log.info("Archived %d complaint(s) (%d so far)", len(ids), moved)
+            if len(ids) < batch_size:
+                return moved
+
+    def restore(self, query_ids):
+        """
+        Move complaints back into the hot table in one transaction. Returns the count restored.
+        """
+        self.ensure_table()
+        with self.db.connection() as conn:
+            conn.start_transaction()
+            cur = conn.cursor()
+            restored = restore_archived(cur, query_ids, self.schema.capabilities()["columns"], self.table)
+            conn.commit()
+            cur.close()
+        return restored
+
+
+def main(argv=None):
+    from db import ConnectionManager, load_db_config
+
+    settings = load_archive_settings()
+    parser = argparse.ArgumentParser(description="Move closed complaints into / out of customer_data_archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="archive complaints closed more than --days days ago")
+    run.add_argument("--days", type=int, default=settings["after_days"])
+    run.add_argument("--batch-size", type=int, default=settings["batch_size"])
+    restore = sub.add_parser("restore", help="move complaints back into customer_data")
+    restore.add_argument("query_ids", type=int, nargs="+")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    db = ConnectionManager(load_db_config(), pool_size=1)
+    try:
+        archive = ComplaintArchive(db)
+        if args.command == "run":
+            moved = archive.archive_closed(args.days, args.batch_size)
+            print(f"Archived {moved} complaint(s) closed before {datetime.now() - timedelta(days=args.days):%Y-%m-%d}")
+        else:
+            print(f"Restored {archive.restore(args.query_ids)} complaint(s)")
+    finally:
+        db.close_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
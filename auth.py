@@ -0,0 +1,33 @@
+"""
+Demo logins for the Client and Support pages.
+
+Static credentials, as before; kept out of the page scripts so both pages
+(and anything that replaces this with a real user store) check them one way.
+"""
+
+# --- static client users (demo) ---
+CLIENT_USERS = {
+    "selva": {"password": "1111", "email": "selva@gmail.com", "mobile": "9000000001"},
+    "sri":  {"password": "2222", "email": "sri@gmail.com",  "mobile": "9000000002"},
+    "naveen": {"password": "3333", "email": "naveen@gmail.com", "mobile": "9000000003"},
+    "rishi": {"password": "4444", "email": "rishi@gmail.com", "mobile": "9000000004"},
+    "rizwan": {"password": "5555", "email": "rizwan@gmail.com", "mobile": "9000000005"},
+}
+
+# --- static support credentials (demo) ---
+SUPPORT_USER = "Support"
+SUPPORT_PASS = "1234"
+
+
+def check_client_login(username, password):
+    """
+    Returns the client's contact details ({"email", "mobile"}) or None if the login is wrong.
+    """
+    user = CLIENT_USERS.get(username)
+    if user is None or user["password"] != password:
+        return None
+    return {"email": user.get("email", ""), "mobile": user.get("mobile", "")}
+
+
+def check_support_login(username, password):
+    return username == SUPPORT_USER and password == SUPPORT_PASS
@@ -0,0 +1,238 @@
+"""
+Load / latency benchmark for the app's data paths against a SQLite stand-in.
+
+    python benchmarks/bench_load.py --rows 100000 --ops 500 --workers 4 --out bench.json
+    python benchmarks/bench_load.py --rows 100000 --compare bench.json
+
+Seeds a customer_data database (benchmarks/sqlite_standin.py), then drives
+the same ComplaintStore methods the Streamlit pages call:
+
+    insert          Raise Query insert
+    client_open     open complaints shown after raising a query
+    client_lookup   Check Status lookup (email + mobile + status)
+    support_counts  status dropdown counts
+    support_list    Support list: first page, then up to --pages following pages
+    support_search  Support keyword search, first page (LIKE fallback: SQLite has no FULLTEXT)
+    support_feed    Support live-update poll (rows changed since the run started)
+    status_update   Update Status + single-row refresh
+
+and reports p50/p95/p99 latency and throughput per path. Results are written
+as JSON; --compare flags paths whose p95 got worse than --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from db import ConnectionManager  # noqa: E402
+from data_access import ComplaintStore  # noqa: E402
+from query_cache import QueryCache  # noqa: E402
+import sqlite_standin  # noqa: E402
+
+STATUSES = ["all", "open", "In Progress", "closed"]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def summarize(latencies, wall_seconds):
+    ordered = sorted(latencies)
+    ms = lambda v: round(v * 1000.0, 3)  # noqa: E731
+    return {
+        "ops": len(ordered),
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+        "max_ms": ms(ordered[-1]) if ordered else 0.0,
+        "throughput_ops_s": round(len(ordered) / wall_seconds, 1) if wall_seconds else 0.0,
+    }
+
+
+def run_path(op, ops, workers, seed_value):
+    """
+    Run op(rng) `ops` times across `workers` threads; returns the summary dict.
+    """
+    latencies = []
+    lock = threading.Lock()
+    per_worker = [ops // workers + (1 if i < ops % workers else 0) for i in range(workers)]
+
+    def worker(index, count):
+        rng = random.Random(seed_value * 1000 + index)
+        local = []
+        for _ in range(count):
+            started = time.perf_counter()
+            op(rng)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(per_worker) if n]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def build_paths(store, contacts, max_id, pages):
+    feed_since = store.fetch_feed_watermark()
+
+    def pick_contact(rng):
+        return sqlite_standin.contact(rng.randrange(contacts))
+
+    def insert(rng):
+        name, email, mobile = pick_contact(rng)
+        store.insert_complaint(name, email, mobile, "Benchmark issue", "Raised by the load benchmark")
+
+    def client_open(rng):
+        _, email, mobile = pick_contact(rng)
+        store.fetch_open_complaints(email, mobile)
+
+    def client_lookup(rng):
+        _, email, mobile = pick_contact(rng)
+        store.fetch_complaints_lookup(None, email, mobile, rng.choice(STATUSES))
+
+    def support_counts(rng):
+        store.fetch_status_counts()
+
+    def support_list(rng):
+        # one op = an agent opening the list and paging 1..`pages` pages deep
+        status = rng.choice(STATUSES)
+        cursor = None
+        for _ in range(rng.randrange(1, pages + 1)):
+            _, cursor, _ = store.fetch_support_page(status, 50, cursor)
+            if cursor is None:
+                break
+
+    def support_search(rng):
+        store.search_complaints(f"issue {rng.randrange(max_id)}", rng.choice(STATUSES), 50)
+
+    def support_feed(rng):
+        store.fetch_changes(feed_since)
+
+    def status_update(rng):
+        query_id = rng.randrange(1, max_id + 1)
+        store.update_complaint_status(query_id, rng.choice(STATUSES[1:]), "updated by benchmark")
+        store.fetch_complaint(query_id)
+
+    return {
+        "insert": insert,
+        "client_open": client_open,
+        "client_lookup": client_lookup,
+        "support_counts": support_counts,
+        "support_list": support_list,
+        "support_search": support_search,
+        "support_feed": support_feed,
+        "status_update": status_update,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print p95 deltas against a previous run; returns the names of regressed paths.
+    """
+    regressed = []
+    print(f"\n{'path':<16} {'base p95':>10} {'now p95':>10} {'change':>8}")
+    for name, now in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get("p95_ms"):
+            continue
+        change = (now["p95_ms"] - base["p95_ms"]) / base["p95_ms"]
+        flag = "  REGRESSION" if change > tolerance else ""
+        if flag:
+            regressed.append(name)
+        print(f"{name:<16} {base['p95_ms']:>10.2f} {now['p95_ms']:>10.2f} {change:>+7.0%}{flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latency/throughput benchmark against a SQLite stand-in.")
+    parser.add_argument("--rows", type=int, default=100_000, help="complaints to seed")
+    parser.add_argument("--contacts", type=int, default=1000, help="distinct customers in the seed data")
+    parser.add_argument("--ops", type=int, default=300, help="operations per path")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent sessions (threads)")
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=5, help="max pages walked per support_list op")
+    parser.add_argument("--paths", nargs="+", help="only run these paths")
+    parser.add_argument("--no-cache", action="store_true", help="disable the lookup cache")
+    parser.add_argument("--no-indexes", action="store_true", help="seed without the schema.py indexes")
+    parser.add_argument("--db", help="reuse / create the SQLite file here instead of a temp file")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="allowed p95 slowdown for --compare")
+    args = parser.parse_args(argv)
+
+    path = args.db
+    fresh = not path or not os.path.exists(path)
+    path = sqlite_standin.create_database(path, indexes=not args.no_indexes)
+    if fresh:
+        started = time.perf_counter()
+        sqlite_standin.seed(path, args.rows, args.contacts, args.seed)
+        print(f"Seeded {args.rows} rows in {time.perf_counter() - started:.1f}s ({path})")
+    with sqlite3.connect(path) as conn:
+        max_id = conn.execute("SELECT COALESCE(MAX(query_id), 0) FROM customer_data").fetchone()[0]
+
+    db = ConnectionManager({}, pool_size=args.pool_size, connect=lambda: sqlite_standin.MySQLConnection(path))
+    cache = None if args.no_cache else QueryCache(ttl=60, maxsize=512)
+    store = ComplaintStore(db, cache=cache)
+
+    paths = build_paths(store, args.contacts, max_id, args.pages)
+    selected = args.paths or list(paths)
+    results = {}
+    print(f"{'path':<16} {'ops':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>9}")
+    for name in selected:
+        res = run_path(paths[name], args.ops, max(1, args.workers), args.seed)
+        results[name] = res
+        print(f"{name:<16} {res['ops']:>6} {res['p50_ms']:>9.2f} {res['p95_ms']:>9.2f} "
+              f"{res['p99_ms']:>9.2f} {res['throughput_ops_s']:>9.1f}")
+    db.close_all()
+    if not args.db:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "rows": args.rows,
+            "contacts": args.contacts,
+            "ops_per_path": args.ops,
+            "workers": args.workers,
+            "pool_size": args.pool_size,
+            "cache": not args.no_cache,
+            "indexes": not args.no_indexes,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(results, json.load(f), args.tolerance)
+        if regressed:
+            print("\nRegressed: " + ", ".join(regressed))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Benchmark: old full-frame timestamp formatting vs. the shared shaping stage.
+
+    python benchmarks/bench_shaping.py [--sizes 10000 100000 1000000]
+
+Both sides time what the app does with a result of N rows before the browser
+sees it: shape the frame, then serialize it to Arrow the way st.dataframe does.
+"before" is the block every fetch path used to run (pd.to_datetime + strftime
+over the whole result, so strings are sent). "after" is shape_complaints
+(datetime64 kept, no parse when the driver already returned datetimes); the
+timestamps are sent as they are and formatted in the browser by
+st.column_config.DatetimeColumn.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shaping import shape_complaints  # noqa: E402
+
+COLS = ["query_id", "name", "email", "mobile", "query_heading", "query_description",
+        "status", "created_at", "closed_at", "remarks"]
+
+
+def make_rows(n):
+    """
+    Rows shaped like mysql.connector output (datetime objects, None for NULLs).
+    """
+    base = datetime(2025, 1, 1)
+    rows = []
+    for i in range(n):
+        created = base + timedelta(seconds=37 * i)
+        closed = created + timedelta(hours=5) if i % 3 == 0 else None
+        rows.append((i, f"user{i % 50}", f"user{i % 50}@mail.com", f"90000{i % 50:05d}",
+                     "heading", "description", "closed" if closed else "open", created, closed, None))
+    return rows
+
+
+def shape_before(rows):
+    df = pd.DataFrame(rows, columns=COLS)
+    if "created_at" in df.columns:
+        df["created_at"] = pd.to_datetime(df["created_at"], errors="coerce").dt.strftime("%d-%m-%Y %H:%M:%S").fillna("")
+    if "closed_at" in df.columns:
+        df["closed_at"] = pd.to_datetime(df["closed_at"], errors="coerce").dt.strftime("%d-%m-%Y %H:%M:%S").fillna("")
+    if "remarks" in df.columns:
+        df["remarks"] = df["remarks"].fillna("")
+    return df
+
+
+def before(rows):
+    return convert_pandas_df_to_arrow_bytes(shape_before(rows))
+
+
+def after(rows):
+    return convert_pandas_df_to_arrow_bytes(shape_complaints(rows, COLS))
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>10} {'before (ms)':>12} {'after (ms)':>11} {'speedup':>8}")
+    for n in args.sizes:
+        rows = make_rows(n)
+        t_before = best_of(lambda: before(rows), args.repeat)
+        t_after = best_of(lambda: after(rows), args.repeat)
+        print(f"{n:>10} {t_before * 1000:>12.1f} {t_after * 1000:>11.1f} {t_before / t_after:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Cold-start and rerun cost of the Streamlit app against a SQLite stand-in.
+
+    python benchmarks/bench_startup.py --rows 50000 --reruns 30 --out startup.json
+
+Measures, per landing page:
+
+    cold    a fresh Python process: import Streamlit's test runner, then the
+            page's first script run (module imports, cached resources, first
+            queries). Each page runs in its own child process so nothing is
+            imported yet; process_ms is the child's whole lifetime.
+    rerun   one process, after a warm-up run: --reruns reruns of the page,
+            i.e. what every widget interaction costs (p50 / p95 wall time)
+
+Pages: home, client (login form), client_in (logged in), support (logged in,
+first page of the list). The app runs under streamlit.testing's AppTest with
+mysql.connector.connect pointed at the stand-in (benchmarks/sqlite_standin.py).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import sqlite_standin  # noqa: E402
+
+ENTRY = os.path.join(ROOT, "client_q.py")
+# landing page -> (page script, session state set before the first run)
+PAGES = {
+    "home": ("app_pages/home.py", {}),
+    "client": ("app_pages/client.py", {}),
+    "client_in": ("app_pages/client.py", {"client_auth": True, "client_user": "selva",
+                                          "client_email": "selva@gmail.com", "client_mobile": "9000000001"}),
+    "support": ("app_pages/support.py", {"support_auth": True, "support_user": "Support"}),
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def use_standin(path):
+    import mysql.connector
+    mysql.connector.connect = lambda **config: sqlite_standin.MySQLConnection(path)
+
+
+def open_page(page):
+    from streamlit.testing.v1 import AppTest
+
+    script, state = PAGES[page]
+    at = AppTest.from_file(ENTRY, default_timeout=120)
+    for key, value in state.items():
+        at.session_state[key] = value
+    at.switch_page(script)
+    return at
+
+
+def run_checked(at):
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"page raised: {at.exception[0].message}")
+
+
+def cold_child(page, path):
+    """
+    Runs in the child process: time the imports and the page's first run.
+    """
+    started = time.perf_counter()
+    use_standin(path)
+    from streamlit.testing.v1 import AppTest  # noqa: F401
+    imported = time.perf_counter()
+    run_checked(open_page(page))
+    done = time.perf_counter()
+    print(json.dumps({"import_ms": round((imported - started) * 1000.0, 1),
+                      "first_run_ms": round((done - imported) * 1000.0, 1)}))
+
+
+def measure_cold(page, path):
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--cold-child", page, "--db", path],
+                         capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["process_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    return result
+
+
+def measure_reruns(page, reruns):
+    at = open_page(page)
+    run_checked(at)  # warm-up: imports, cached resources, session state
+    timings = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        run_checked(at)
+        timings.append(time.perf_counter() - started)
+    ordered = sorted(timings)
+    return {"reruns": reruns,
+            "p50_ms": round(percentile(ordered, 50) * 1000.0, 1),
+            "p95_ms": round(percentile(ordered, 95) * 1000.0, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start / rerun benchmark of the Streamlit pages.")
+    parser.add_argument("--rows", type=int, default=50_000, help="complaints to seed")
+    parser.add_argument("--reruns", type=int, default=30, help="reruns timed per page")
+    parser.add_argument("--pages", nargs="+", choices=list(PAGES), help="only these pages")
+    parser.add_argument("--db", help="reuse / create the SQLite file here instead of a temp file")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--cold-child", choices=list(PAGES), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.cold_child:
+        cold_child(args.cold_child, args.db)
+        return 0
+
+    path = args.db
+    fresh = not path or not os.path.exists(path)
+    path = sqlite_standin.create_database(path)
+    if fresh:
+        sqlite_standin.seed(path, args.rows)
+    use_standin(path)
+
+    results = {}
+    print(f"{'page':<10} {'process ms':>11} {'import ms':>10} {'first run ms':>13} {'rerun p50':>10} {'rerun p95':>10}")
+    for page in args.pages or list(PAGES):
+        res = dict(measure_cold(page, path), **measure_reruns(page, args.reruns))
+        results[page] = res
+        print(f"{page:<10} {res['process_ms']:>11.0f} {res['import_ms']:>10.0f} {res['first_run_ms']:>13.0f} "
+              f"{res['p50_ms']:>10.1f} {res['p95_ms']:>10.1f}")
+    if not args.db:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "rows": args.rows,
+            "reruns": args.reruns,
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
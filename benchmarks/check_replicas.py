@@ -0,0 +1,109 @@
+"""
+Read-your-writes check for db.ReplicaRouter against a lagging replica stand-in.
+
+    python benchmarks/check_replicas.py --sticky-seconds 1
+
+The primary and the replica are two SQLite stand-in databases
+(benchmarks/sqlite_standin.py). The replica is a copy of the primary that only
+catches up when the script copies it again, i.e. a replica that lags until told
+otherwise. Through the same ComplaintStore the pages use, it checks that:
+
+    idle        a session that has not written reads from the replica
+    sticky      after session A inserts a complaint (mark_written), A's reads
+                go to the primary and see it for sticky_seconds
+    others      meanwhile session B still reads the replica, which does not
+                have the complaint yet
+    expired     once sticky_seconds have passed, A reads the replica again
+    replicated  after the replica catches up, A sees the row there
+
+Prints one line per check and exits non-zero if any of them fails.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from db import ConnectionManager, ReplicaRouter, db_session  # noqa: E402
+from data_access import ComplaintStore  # noqa: E402
+import sqlite_standin  # noqa: E402
+
+
+def replicate(primary_path, replica_path):
+    # the whole primary copied over the replica: the replica "catches up"
+    src, dst = sqlite3.connect(primary_path), sqlite3.connect(replica_path)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that a session's reads stick to the primary after its own write.")
+    parser.add_argument("--rows", type=int, default=1000, help="complaints seeded before the check")
+    parser.add_argument("--sticky-seconds", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    primary_path = sqlite_standin.create_database()
+    replica_path = sqlite_standin.create_database()
+    sqlite_standin.seed(primary_path, args.rows)
+    replicate(primary_path, replica_path)
+
+    router = ReplicaRouter(
+        ConnectionManager({}, connect=lambda: sqlite_standin.MySQLConnection(primary_path)),
+        [ConnectionManager({}, connect=lambda: sqlite_standin.MySQLConnection(replica_path))],
+        sticky_seconds=args.sticky_seconds,
+    )
+    store = ComplaintStore(router)
+    failures = []
+
+    def check(name, ok, detail):
+        print(f"{'ok' if ok else 'FAIL':<5} {name:<11} {detail}")
+        if not ok:
+            failures.append(name)
+
+    def read(session, query_id):
+        # one read as `session`: (routed to, found the row)
+        before = router.stats()
+        with db_session(session):
+            found = not store.fetch_complaint(query_id).empty
+        after = router.stats()
+        routed = [k for k in ("replica_reads", "sticky_reads", "primary_reads") if after[k] > before[k]]
+        return (routed[0] if routed else "?"), found
+
+    try:
+        routed, _ = read("A", 1)
+        check("idle", routed == "replica_reads", f"A read from {routed}")
+
+        with db_session("A"):
+            new_id = store.insert_complaint("Replica Check", "replica@example.com", "9000000000",
+                                            "Replica check", "Written to the primary only")
+            written = time.monotonic()
+            sticky = router.is_sticky()
+        routed_a, seen_a = read("A", new_id)
+        routed_b, seen_b = read("B", new_id)
+        check("sticky", sticky and routed_a == "sticky_reads" and seen_a,
+              f"A read from {routed_a}, saw its complaint #{new_id}: {seen_a}")
+        check("others", routed_b == "replica_reads" and not seen_b,
+              f"B read from {routed_b}, saw #{new_id} (replica lagging): {seen_b}")
+
+        time.sleep(max(0.0, written + args.sticky_seconds - time.monotonic()) + 0.05)
+        routed, seen = read("A", new_id)
+        check("expired", routed == "replica_reads" and not seen,
+              f"after {args.sticky_seconds:g}s A read from {routed}, saw #{new_id}: {seen}")
+
+        replicate(primary_path, replica_path)
+        routed, seen = read("A", new_id)
+        check("replicated", routed == "replica_reads" and seen, f"A read from {routed}, saw #{new_id}: {seen}")
+    finally:
+        router.close_all()
+        for path in (primary_path, replica_path):
+            os.remove(path)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
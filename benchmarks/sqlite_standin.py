@@ -0,0 +1,208 @@
+"""
+A local SQLite stand-in for the MySQL customer_data database.
+
+Benchmarks use it to drive the real data-access code (data_access.py,
+db.ConnectionManager) without a MySQL server. MySQLConnection wraps a
+sqlite3 connection with the subset of the mysql.connector API the app uses
+and rewrites the few MySQL-only statements to SQLite equivalents. It is a
+stand-in for measuring relative costs and regressions, not a MySQL emulator.
+"""
+import os
+import random
+import re
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(sep=" "))
+sqlite3.register_converter("DATETIME", lambda b: datetime.fromisoformat(b.decode()))
+
+# MySQL-isms used by the app -> SQLite
+_REWRITES = [
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\s+FOR UPDATE\b", re.I), ""),
+    (re.compile(r"\s+LOCK IN SHARE MODE\b", re.I), ""),
+    (re.compile(r"\bTIMESTAMPDIFF\(SECOND,\s*(\w+),\s*(\w+)\)", re.I),
+     r"(CAST(strftime('%s', \2) AS INTEGER) - CAST(strftime('%s', \1) AS INTEGER))"),
+    (re.compile(r"\bINSERT IGNORE\b", re.I), "INSERT OR IGNORE"),
+    (re.compile(r"\bON DUPLICATE KEY UPDATE\b", re.I), "ON CONFLICT DO UPDATE SET"),
+    (re.compile(r"\bVALUES\((\w+)\)", re.I), r"excluded.\1"),
+    (re.compile(r"\bCURRENT_TIMESTAMP\(6\)", re.I), "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"),
+    (re.compile(r"\bGREATEST\(", re.I), "MAX("),
+    (re.compile(r"\bLEAST\(", re.I), "MIN("),
+]
+_SHOW_COLUMNS = re.compile(r"^\s*SHOW\s+COLUMNS\s+FROM\s+(\w+)(?:\s+LIKE\s+'(\w+)')?", re.I)
+_SHOW_TABLES = re.compile(r"^\s*SHOW\s+TABLES\s+LIKE\s+'(\w+)'", re.I)
+
+
+def translate(sql):
+    for pattern, repl in _REWRITES:
+        sql = pattern.sub(repl, sql)
+    return sql
+
+
+class MySQLCursor:
+    def __init__(self, conn):
+        self._cur = conn.cursor()
+
+    def execute(self, sql, params=()):
+        show = _SHOW_COLUMNS.match(sql)
+        if show:
+            # SHOW COLUMNS layout: Field, Type, Null, Key, Default, Extra
+            table, like = show.group(1), show.group(2)
+            self._cur.execute(
+                "SELECT name, type, CASE WHEN \"notnull\" THEN 'NO' ELSE 'YES' END, "
+                "CASE WHEN pk THEN 'PRI' ELSE '' END, dflt_value, "
+                "CASE WHEN pk AND lower(type) = 'integer' THEN 'auto_increment' ELSE '' END "
+                "FROM pragma_table_info(?)" + (" WHERE name = ?" if like else ""),
+                (table, like) if like else (table,)
+            )
+            return
+        show = _SHOW_TABLES.match(sql)
+        if show:
+            self._cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (show.group(1),))
+            return
+        self._cur.execute(translate(sql), tuple(params or ()))
+
+    def executemany(self, sql, seq_params):
+        self._cur.executemany(translate(sql), [tuple(p) for p in seq_params])
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def fetchmany(self, size=1):
+        return self._cur.fetchmany(size)
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def close(self):
+        self._cur.close()
+
+
+class MySQLConnection:
+    """
+    sqlite3 connection exposing the mysql.connector calls used by the app.
+    Autocommit unless start_transaction() was called, like the app's pool.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES,
+                                     check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    def cursor(self, *args, **kwargs):
+        return MySQLCursor(self._conn)
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def start_transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+
+    def is_connected(self):
+        return True
+
+    def reconnect(self, attempts=1, delay=0):
+        pass
+
+    def close(self):
+        self._conn.close()
+
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS customer_data (
+        query_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(100),
+        email VARCHAR(100),
+        mobile VARCHAR(20),
+        query_heading VARCHAR(255),
+        query_description TEXT,
+        status VARCHAR(20),
+        created_at DATETIME,
+        closed_at DATETIME,
+        remarks TEXT,
+        updated_at DATETIME,
+        idempotency_key CHAR(64) UNIQUE,
+        analytics_counted TINYINT NOT NULL DEFAULT 0
+    )
+"""
+
+
+def create_database(path=None, indexes=True):
+    """
+    Create an empty customer_data database; returns its path.
+    """
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix="cq_bench_", suffix=".db")
+        os.close(fd)
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute(CREATE_TABLE)
+    if indexes:
+        from schema import INDEXES
+        for name, cols in INDEXES:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON customer_data ({', '.join(cols)})")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def contact(i):
+    return f"user{i}", f"user{i}@example.com", f"9{i:09d}"
+
+
+def seed(path, rows, contacts=1000, seed_value=42, batch=10_000):
+    """
+    Insert `rows` complaints spread over `contacts` customers and the last ~year.
+    No timestamp is later than now, so the newest updated_at is a valid
+    change-feed watermark for rows written afterwards.
+    """
+    rng = random.Random(seed_value)
+    now = datetime.now()
+    start = now - timedelta(days=365)
+    statuses = ["open", "In Progress", "closed"]
+    conn = sqlite3.connect(path)
+    sql = ("INSERT INTO customer_data (name, email, mobile, query_heading, query_description, status, "
+           "created_at, closed_at, remarks, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+    pending = []
+    for i in range(rows):
+        name, email, mobile = contact(rng.randrange(contacts))
+        status = rng.choices(statuses, weights=[3, 2, 5])[0]
+        created = start + timedelta(seconds=rng.randrange(365 * 86400))
+        closed = min(created + timedelta(hours=rng.randrange(1, 240)), now) if status == "closed" else None
+        pending.append((name, email, mobile, f"Issue {i}", f"Description of issue {i}", status,
+                        created.isoformat(sep=" "), closed.isoformat(sep=" ") if closed else None,
+                        "resolved" if closed else None, (closed or created).isoformat(sep=" ")))
+        if len(pending) >= batch:
+            conn.executemany(sql, pending)
+            pending = []
+    if pending:
+        conn.executemany(sql, pending)
+    conn.commit()
+    conn.close()
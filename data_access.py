@@ -0,0 +1,770 @@
+"""
+Data access for customer_data: SQL builders plus the ComplaintStore service
+used by the Streamlit pages, the benchmarks and the CLI tools.
+
+The SQL builders are plain functions returning (sql, params) so the same
+statements can be executed, EXPLAINed or streamed. ComplaintStore wires them
+to a connection manager (db.py), the lookup cache (query_cache.py), the
+schema helpers (schema.py) and the analytics summaries (analytics.py); it has
+no Streamlit dependency.
+"""
+import logging
+import os
+import re
+import string
+import time
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+from db import CONNECTION_ERRORS
+from query_cache import open_complaints_key, lookup_key
+from schema import (SchemaInspector, QueryIdAllocator, is_duplicate_key, TEXT_SEARCH_COLUMNS, ARCHIVE_TABLE,
+                    ARCHIVE_COUNT_TABLE)
+from analytics import CLOSED_STATUS
+from archive import restore_archived
+from shaping import shape_complaints
+
+log = logging.getLogger(__name__)
+
+COMPLAINT_COLUMNS = "query_id, name, email, mobile, query_heading, query_description, status, created_at, closed_at, remarks"
+SUPPORT_PAGE_SIZES = [25, 50, 100, 200]
+# updated_at values are set on the database clock and become visible at commit,
+# so a row can appear slightly "in the past"; each poll re-reads this window
+FEED_OVERLAP_SECONDS = 5
+FEED_BATCH = 500
+
+
+def load_feed_settings():
+    """
+    Support change-feed polling interval, read from the environment.
+    """
+    return {"poll_seconds": float(os.environ.get("CQ_FEED_POLL_SECONDS", "10"))}
+
+
+# ---------------- SQL builders ----------------
+def _status_where(status_filter):
+    """
+    WHERE fragment + params for the status filter ('all' / empty = no filter).
+    A plain equality (not COALESCE(status, '')) so the status indexes apply;
+    NULL never equals a non-empty filter value, so results are unchanged.
+    """
+    if status_filter and status_filter != "all":
+        return " AND status = %s", [status_filter]
+    return "", []
+
+def _select_columns(with_remarks=True, with_updated_at=False):
+    cols = "query_id, name, email, mobile, query_heading, query_description, status, created_at, closed_at"
+    if with_remarks:
+        cols += ", remarks"
+    return cols + ", updated_at" if with_updated_at else cols
+
+def open_complaints_sql(email_val, mobile_val):
+    """
+    Open complaints for a contact. The email and mobile branches are separate
+    SELECTs joined with UNION (which also drops rows matching both) so each can
+    use its own (email|mobile, status, created_at) index; an OR across the two
+    columns would force a full scan.
+    """
+    sql = f"""
+        SELECT {COMPLAINT_COLUMNS} FROM customer_data WHERE email = %s AND status = 'open'
+        UNION
+        SELECT {COMPLAINT_COLUMNS} FROM customer_data WHERE mobile = %s AND status = 'open'
+        ORDER BY created_at DESC, query_id DESC
+    """
+    return sql, (email_val, mobile_val)
+
+def lookup_sql(name_val=None, email_val=None, mobile_val=None, status_filter=None, query_id_val=None,
+               with_archive=False):
+    """
+    Build SQL dynamically so missing filters mean 'don't filter by that column'.
+    `with_archive` adds the same filters over the closed-complaint archive (UNION ALL).
+    """
+    base_sql = "WHERE 1=1"
+    params = []
+
+    # Add filters only when provided and non-empty
+    if name_val:
+        base_sql += " AND name = %s"
+        params.append(name_val)
+    if email_val:
+        base_sql += " AND email = %s"
+        params.append(email_val)
+    if mobile_val:
+        base_sql += " AND mobile = %s"
+        params.append(mobile_val)
+
+    if query_id_val is not None:
+        base_sql += " AND query_id = %s"
+        params.append(int(query_id_val))
+
+    where_sql, status_params = _status_where(status_filter)
+    base_sql += where_sql
+    params += status_params
+
+    sql = f"SELECT {COMPLAINT_COLUMNS} FROM customer_data {base_sql}"
+    if with_archive:
+        sql += f" UNION ALL SELECT {COMPLAINT_COLUMNS} FROM {ARCHIVE_TABLE} {base_sql}"
+        params += params
+    sql += " ORDER BY created_at DESC, query_id DESC"
+    return sql, tuple(params)
+
+def support_page_sql(status_filter=None, page_size=50, cursor=None, with_remarks=True, with_updated_at=False,
+                     with_archive=False):
+    """
+    Keyset-paged support list query. `cursor` is the (created_at, query_id) of
+    the last row of the previous page (None for the first page). Rows are
+    ordered by created_at DESC, query_id DESC and MySQL puts NULL created_at
+    last, so the cursor condition handles that tail. One extra row is fetched
+    to tell whether there is a next page.
+
+    `with_archive` pages over customer_data and the archive together: each
+    side reads at most one page through its own index and the two are merged.
+    """
+    where_sql, params = _status_where(status_filter)
+    if cursor is not None:
+        cur_created, cur_id = cursor
+        if cur_created is None:
+            where_sql += " AND created_at IS NULL AND query_id < %s"
+            params += [cur_id]
+        else:
+            where_sql += " AND (created_at < %s OR (created_at = %s AND query_id < %s) OR created_at IS NULL)"
+            params += [cur_created, cur_created, cur_id]
+    params.append(int(page_size) + 1)
+
+    order_sql = " ORDER BY created_at DESC, query_id DESC LIMIT %s"
+    sql = "SELECT " + _select_columns(with_remarks, with_updated_at) + " FROM customer_data WHERE 1=1" + where_sql + order_sql
+    if with_archive:
+        # the archive has no updated_at
+        archive_cols = _select_columns(with_remarks, False) + (", NULL AS updated_at" if with_updated_at else "")
+        archive_sql = f"SELECT {archive_cols} FROM {ARCHIVE_TABLE} WHERE 1=1" + where_sql + order_sql
+        sql = (f"SELECT * FROM ({sql}) AS hot UNION ALL SELECT * FROM ({archive_sql}) AS archived"
+               + order_sql)
+        params = params + params + [params[-1]]
+    return sql, tuple(params)
+
+def changes_sql(after, limit=FEED_BATCH, with_remarks=True):
+    """
+    Rows inserted or updated after the keyset position `after` = (updated_at,
+    query_id), oldest change first; None reads from the start. A range scan on
+    (updated_at, query_id), so a poll costs O(changes), not O(table).
+    """
+    where_sql, params = "", []
+    if after is not None:
+        where_sql = "WHERE updated_at >= %s AND (updated_at > %s OR query_id > %s) "
+        params = [after[0], after[0], int(after[1])]
+    sql = (f"SELECT {_select_columns(with_remarks, True)} FROM customer_data "
+           f"{where_sql}ORDER BY updated_at, query_id LIMIT %s")
+    return sql, tuple(params + [int(limit)])
+
+def feed_horizon(since):
+    """
+    Oldest updated_at a later poll from the feed position `since` can re-read
+    (for pruning the rows a page has already seen).
+    """
+    if since is None or since[0] is None:
+        return datetime.min
+    return since[0] - timedelta(seconds=FEED_OVERLAP_SECONDS)
+
+STATUS_COUNTS_SQL = "SELECT status, COUNT(*) FROM customer_data GROUP BY status"
+# archived complaints are all closed: their number is kept in one row by archive.py
+ARCHIVED_COUNT_SQL = f"SELECT archived FROM {ARCHIVE_COUNT_TABLE} WHERE name = %s"
+
+# InnoDB full-text defaults: words shorter than innodb_ft_min_token_size and
+# stopwords are not in the index, so a required (+) one would match nothing
+FULLTEXT_MIN_TOKEN = 3
+FULLTEXT_STOPWORDS = frozenset(
+    "a about an are as at be by com de en for from how i in is it la of on or that the this to was what "
+    "when where who will with und www".split()
+)
+# LIKE fallback ranking: a hit in the heading counts more than one in the body
+LIKE_WEIGHTS = {"query_heading": 3, "query_description": 2, "remarks": 1}
+
+def search_terms(text):
+    """
+    Distinct lower-cased words of a search box entry (operators and punctuation dropped).
+    """
+    terms = []
+    for word in re.split(r"\W+", str(text or "").lower()):
+        if word and word not in terms:
+            terms.append(word)
+    return terms
+
+def _like_pattern(term):
+    return "%" + term.replace("!", "!!").replace("%", "!%").replace("_", "!_") + "%"
+
+def search_sql(text, status_filter=None, page_size=50, offset=0, fulltext_columns=None, with_remarks=True,
+               with_updated_at=False):
+    """
+    Ranked keyword search over heading / description / remarks, OFFSET-paged
+    (one extra row is fetched to tell whether there is a next page). With
+    page_size None (exports) every match is returned with the display columns
+    only, without the internal relevance score. Every word must match.
+
+    With a FULLTEXT index (`fulltext_columns`, in index order) the words go to
+    MATCH ... AGAINST in BOOLEAN MODE as required prefixes (+refund*) and rows
+    are ranked by relevance; words the index cannot hold (too short,
+    stopwords) are checked with LIKE on the rows the index found. Without the
+    index every word is a LIKE filter and rows are ranked by where the words
+    occur (LIKE_WEIGHTS), which scans the table.
+    """
+    terms = search_terms(text)
+    text_cols = [c for c in TEXT_SEARCH_COLUMNS if with_remarks or c != "remarks"]
+    ft_terms = [t for t in terms if len(t) >= FULLTEXT_MIN_TOKEN and t not in FULLTEXT_STOPWORDS] if fulltext_columns else []
+    like_terms = [t for t in terms if t not in ft_terms]
+
+    score_sql, score_params = "0", []
+    where_sql, params = "", []
+    if ft_terms:
+        match = f"MATCH({', '.join(fulltext_columns)}) AGAINST (%s IN BOOLEAN MODE)"
+        against = " ".join(f"+{t}*" for t in ft_terms)
+        score_sql, score_params = match, [against]
+        where_sql += " AND " + match
+        params.append(against)
+    elif like_terms:
+        score_sql = " + ".join(f"CASE WHEN {col} LIKE %s ESCAPE '!' THEN {LIKE_WEIGHTS[col]} ELSE 0 END"
+                               for _ in like_terms for col in text_cols)
+        score_params = [_like_pattern(t) for t in like_terms for _ in text_cols]
+    for term in like_terms:
+        where_sql += " AND (" + " OR ".join(f"{col} LIKE %s ESCAPE '!'" for col in text_cols) + ")"
+        params += [_like_pattern(term)] * len(text_cols)
+
+    status_sql, status_params = _status_where(status_filter)
+    columns = _select_columns(with_remarks, with_updated_at)
+    sql = f"SELECT {columns}, {score_sql} AS relevance FROM customer_data WHERE 1=1{where_sql}{status_sql}"
+    order_sql = " ORDER BY relevance DESC, created_at DESC, query_id DESC"
+    if page_size is None:
+        # every match (exports), ranked the same way but without the score column
+        return f"SELECT {columns} FROM ({sql}) AS ranked{order_sql}", tuple(score_params + params + status_params)
+    return (sql + order_sql + " LIMIT %s OFFSET %s",
+            tuple(score_params + params + status_params + [int(page_size) + 1, int(offset)]))
+
+def planned_queries(caps=None):
+    """
+    Representative instances of the app's queries, for the startup EXPLAIN
+    check, built for the schema described by `caps` (SchemaInspector
+    capabilities) the way the app would run them: the search probe uses
+    MATCH() only when the FULLTEXT index exists, the LIKE form otherwise.
+    """
+    caps = caps or {}
+    with_remarks = caps.get("has_remarks", True)
+    probe_time = datetime(2000, 1, 1)
+    queries = {
+        "client open complaints": open_complaints_sql("probe@example.com", "0000000000"),
+        "client status lookup": lookup_sql(None, "probe@example.com", "0000000000", "open"),
+        "support first page": support_page_sql(None, 50, None, with_remarks),
+        "support page by status": support_page_sql("open", 50, None, with_remarks),
+        "support next page": support_page_sql(None, 50, (probe_time, 1), with_remarks),
+        "support status counts": (STATUS_COUNTS_SQL, ()),
+        "support search": search_sql("refund", None, 50, 0, caps.get("fulltext_columns"), with_remarks),
+        "complaint by id": (f"SELECT {COMPLAINT_COLUMNS} FROM customer_data WHERE query_id = %s", (1,)),
+    }
+    if caps.get("has_updated_at", True):
+        queries["support change feed"] = changes_sql((probe_time, 1), FEED_BATCH, with_remarks)
+    return queries
+
+
+# ---------------- bulk updates ----------------
+REMARKS_PLACEHOLDERS = ("query_id", "name", "email", "old_status", "status", "date")
+
+
+def render_remarks(template, row, new_status):
+    """
+    Fill a bulk-update remarks template, e.g. "Closed as duplicate of #{query_id} on {date}".
+    Only REMARKS_PLACEHOLDERS may be used; anything else raises KeyError.
+    """
+    values = {"query_id": row["query_id"], "name": row.get("name") or "", "email": row.get("email") or "",
+              "old_status": row.get("status") or "", "status": new_status,
+              "date": datetime.now().strftime("%Y-%m-%d")}
+    for _, field, _, _ in string.Formatter().parse(template):
+        if field is not None and field not in values:
+            raise KeyError(field)
+    return template.format_map(values)
+
+
+def check_remarks_template(template):
+    """
+    Raise ValueError if `template` would fail in render_remarks (unknown
+    placeholder, bad format spec), so a bulk update is rejected once up front.
+    """
+    try:
+        render_remarks(template, {"query_id": 1, "name": "", "email": "", "status": ""}, "")
+    except KeyError as e:
+        raise ValueError(f"Unknown placeholder {{{e.args[0]}}} in the remarks template; use "
+                         + ", ".join("{" + p + "}" for p in REMARKS_PLACEHOLDERS)) from None
+    except (IndexError, ValueError) as e:
+        raise ValueError(f"Invalid remarks template: {e}") from None
+
+
+# ---------------- service ----------------
+class ComplaintStore:
+    """
+    Complaint reads and writes on top of a ConnectionManager (or a
+    ReplicaRouter: reads use read_connection(), writes mark the session so
+    its next reads see them, see db.py).
+
+    `cache` (a QueryCache) is optional; when given, client lookups are cached
+    and every write here invalidates the affected keys. `instrumentation`
+    (instrumentation.py) times the result-shaping step. `analytics` (an
+    AnalyticsSummary) is optional too; when given, inserts and status changes
+    keep the support analytics summaries current.
+    """
+
+    def __init__(self, db, cache=None, schema=None, allocator=None, instrumentation=None, analytics=None):
+        self.db = db
+        self.cache = cache
+        self.schema = schema or SchemaInspector(db)
+        self.allocator = allocator or QueryIdAllocator(db)
+        self.instrumentation = instrumentation
+        self.analytics = analytics
+
+    def _shape(self, rows, cols):
+        with self.instrumentation.span("shape.complaints") if self.instrumentation else nullcontext():
+            return shape_complaints(rows, cols)
+
+    def _run_select(self, sql, params):
+        with self.db.read_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+            cols = [d[0] for d in cur.description] if cur.description else []
+            cur.close()
+        return rows, cols
+
+    def _cached_select(self, key, build_sql):
+        # a session that just wrote reads the primary and skips the cache, which may hold an older replica copy
+        sticky = self.db.is_sticky()
+        if self.cache is not None and not sticky:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached.copy()
+        # the SQL is only built on a miss: building it may need a schema check (archive table)
+        rows, cols = self._run_select(*build_sql())
+        df = self._shape(rows, cols)
+        # replica results from right after a write may predate it: not cached
+        if self.cache is not None and (sticky or not self.db.replicas_catching_up()):
+            self.cache.set(key, df)
+            return df.copy()
+        return df
+
+    def has_remarks(self):
+        return self.schema.capabilities()["has_remarks"]
+
+    def has_updated_at(self):
+        return self.schema.capabilities()["has_updated_at"]
+
+    def _with_archive(self, status_filter):
+        # archived complaints are all closed: only "closed" / "all" need to look there
+        return (not status_filter or status_filter in ("all", CLOSED_STATUS)) and self.schema.has_archive()
+
+    # ---------------- client reads ----------------
+    def fetch_open_complaints(self, email_val, mobile_val):
+        return self._cached_select(open_complaints_key(email_val, mobile_val),
+                                   lambda: open_complaints_sql(email_val, mobile_val))
+
+    def fetch_complaints_lookup(self, name_val=None, email_val=None, mobile_val=None, status_filter=None, query_id_val=None):
+        """
+        Complaints matching every provided filter, newest first.
+        Results are cached per normalized filter tuple (see query_cache.py).
+        """
+        return self._cached_select(lookup_key(name_val, email_val, mobile_val, status_filter, query_id_val),
+                                   lambda: lookup_sql(name_val, email_val, mobile_val, status_filter, query_id_val,
+                                                      self._with_archive(status_filter)))
+
+    # ---------------- support reads ----------------
+    def fetch_status_counts(self):
+        """
+        Return {status: count} for every distinct status in one GROUP BY query.
+        NULL statuses are counted under None so the 'all' total stays correct.
+        Archived complaints are included under 'closed' from the archive's
+        row counter, so the archive itself is never scanned.
+        """
+        rows, _ = self._run_select(STATUS_COUNTS_SQL, ())
+        counts = {}
+        for status, cnt in rows:
+            key = str(status) if status is not None else None
+            counts[key] = counts.get(key, 0) + int(cnt)
+        if self.schema.has_archive():
+            archived, _ = self._run_select(ARCHIVED_COUNT_SQL, (ARCHIVE_TABLE,))
+            if archived and int(archived[0][0]):
+                counts[CLOSED_STATUS] = counts.get(CLOSED_STATUS, 0) + int(archived[0][0])
+        return counts
+
+    def fetch_support_page(self, status_filter=None, page_size=50, cursor=None):
+        """
+        Fetch one page of complaints, newest first, using a keyset cursor.
+        Returns (df, next_cursor, remarks_present). next_cursor is None on the last page.
+        """
+        remarks_present = self.has_remarks()
+        rows, cols = self._run_select(*support_page_sql(status_filter, page_size, cursor, remarks_present,
+                                                        self.has_updated_at(), self._with_archive(status_filter)))
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            # keep the raw DB values for the cursor (before any display formatting)
+            next_cursor = (last[cols.index("created_at")], last[cols.index("query_id")])
+
+        return self._shape(rows, cols), next_cursor, remarks_present
+
+    def search_complaints(self, text, status_filter=None, page_size=50, cursor=None):
+        """
+        One page of ranked search results, shaped like fetch_support_page:
+        (df, next_cursor, remarks_present), the cursor being the row offset
+        of the next page. Uses the FULLTEXT index when the schema has one.
+        """
+        caps = self.schema.capabilities()
+        offset = int(cursor or 0)
+        rows, cols = self._run_select(*search_sql(text, status_filter, page_size, offset,
+                                                  caps.get("fulltext_columns"), caps["has_remarks"],
+                                                  caps["has_updated_at"]))
+        next_cursor = offset + page_size if len(rows) > page_size else None
+        return self._shape(rows[:page_size], cols), next_cursor, caps["has_remarks"]
+
+    # ---------------- exports (export.py streams these) ----------------
+    def lookup_export_sql(self, name_val=None, email_val=None, mobile_val=None, status_filter=None, query_id_val=None):
+        """
+        (sql, params) of fetch_complaints_lookup, for streaming.
+        """
+        return lookup_sql(name_val, email_val, mobile_val, status_filter, query_id_val, self._with_archive(status_filter))
+
+    def support_export_sql(self, status_filter=None, search_text=""):
+        """
+        (sql, params) of the whole Support list view (every page): ranked search
+        results when `search_text` is set, else the status-filtered list newest first.
+        """
+        if search_text:
+            caps = self.schema.capabilities()
+            return search_sql(search_text, status_filter, None, 0, caps.get("fulltext_columns"), caps["has_remarks"])
+        return lookup_sql(None, None, None, status_filter, None, self._with_archive(status_filter))
+
+    def fetch_complaint(self, query_id):
+        """
+        One complaint by id as a 1-row frame shaped like the support page (empty if gone).
+        """
+        rows, cols = self._run_select(
+            f"SELECT {_select_columns(self.has_remarks(), self.has_updated_at())} FROM customer_data WHERE query_id = %s",
+            (int(query_id),)
+        )
+        return self._shape(rows, cols)
+
+    # ---------------- change feed ----------------
+    def fetch_feed_watermark(self):
+        """
+        Feed position of the latest change, the starting point for fetch_changes:
+        (updated_at, query_id, when it was reached); (None, None, ...) on an empty table.
+        """
+        # ORDER BY ... LIMIT 1 rather than MAX(): same index lookup, keeps the column type
+        rows, _ = self._run_select(
+            "SELECT updated_at, query_id FROM customer_data ORDER BY updated_at DESC, query_id DESC LIMIT 1", ()
+        )
+        last_ts, last_id = rows[0] if rows else (None, None)
+        return last_ts, last_id, time.monotonic()
+
+    def fetch_changes(self, since, limit=FEED_BATCH):
+        """
+        Rows inserted / updated after the feed position `since`, oldest first,
+        and the next position. Reads `limit` rows at a time, keyset-paged on
+        (updated_at, query_id), until a batch comes back short, so any number
+        of rows sharing one updated_at get through.
+
+        Until FEED_OVERLAP_SECONDS have passed since the position was reached,
+        the poll starts that far before it, for rows committed late with an
+        earlier updated_at; callers drop rows they already saw with the same updated_at.
+        """
+        if since is None:
+            return self._shape([], []), self.fetch_feed_watermark()
+        last_ts, last_id, reached_at = since
+        if last_ts is None:
+            after = None
+        elif time.monotonic() - reached_at > FEED_OVERLAP_SECONDS:
+            # anything stamped before the position has committed by now
+            after = (last_ts, last_id)
+        else:
+            after = (last_ts - timedelta(seconds=FEED_OVERLAP_SECONDS), 0)
+        rows, cols = [], []
+        while True:
+            batch, cols = self._run_select(*changes_sql(after, limit, self.has_remarks()))
+            rows.extend(batch)
+            if len(batch) < limit:
+                break
+            after = (batch[-1][cols.index("updated_at")], batch[-1][cols.index("query_id")])
+        df = self._shape(rows, cols)
+        if rows:
+            newest = (rows[-1][cols.index("updated_at")], rows[-1][cols.index("query_id")])
+            if last_ts is None or newest > (last_ts, last_id):
+                return df, newest + (time.monotonic(),)
+        return df, since
+
+    # ---------------- writes ----------------
+    def insert_complaint(self, name, email, mobile, query_heading, query_description):
+        """
+        Insert a new 'open' complaint with a single INSERT and return its query_id.
+        If query_id is not AUTO_INCREMENT the id comes from the block allocator.
+        """
+        created_at = datetime.now()
+        # updated_at comes from the database clock, like the change feed's watermark
+        touch_col, touch_val = (", updated_at", ", CURRENT_TIMESTAMP(6)") if self.has_updated_at() else ("", "")
+        if self.schema.capabilities()["query_id_auto_increment"]:
+            insert_sql = f"""
+                INSERT INTO customer_data (name, email, mobile, query_heading, query_description, status, created_at{touch_col})
+                VALUES (%s, %s, %s, %s, %s, %s, %s{touch_val})
+            """
+            params = (name, email, mobile, query_heading, query_description, 'open', created_at)
+            with self.db.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(insert_sql, params)
+                conn.commit()
+                new_id = cur.lastrowid
+                cur.close()
+        else:
+            insert_sql = f"""
+                INSERT INTO customer_data (query_id, name, email, mobile, query_heading, query_description, status, created_at{touch_col})
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s{touch_val})
+            """
+            for attempt in range(2):
+                new_id = self.allocator.next_id()
+                params = (new_id, name, email, mobile, query_heading, query_description, 'open', created_at)
+                try:
+                    with self.db.connection() as conn:
+                        cur = conn.cursor()
+                        cur.execute(insert_sql, params)
+                        conn.commit()
+                        cur.close()
+                    break
+                except Exception as e:
+                    # ids inserted behind the sequence's back: catch up once and retry
+                    if attempt == 0 and is_duplicate_key(e):
+                        self.allocator.resync()
+                        continue
+                    raise
+
+        self.db.mark_written()
+        # drop cached lookups this new complaint belongs to
+        if self.cache is not None:
+            self.cache.invalidate_rows({"query_id": new_id, "name": name, "email": email,
+                                        "mobile": mobile, "status": "open"})
+        # the complaint is saved either way; a failed catch-up is retried by the next one
+        if self.analytics is not None:
+            try:
+                self.analytics.catch_up()
+            except Exception as e:
+                log.warning("Analytics catch-up failed: %s", e)
+        return new_id
+
+    def insert_complaints(self, records):
+        """
+        Insert a batch of new 'open' complaints (dicts with the form fields and
+        an optional idempotency_key) in one transaction; returns their query_ids
+        in order. With the idempotency_key column a record whose key is already
+        stored is skipped and the existing row's id returned, so a batch that
+        failed half-way can simply be retried.
+        """
+        if not records:
+            return []
+        caps = self.schema.capabilities()
+        created_at = datetime.now()
+        keyed = caps["has_idempotency_key"] and all(r.get("idempotency_key") for r in records)
+        columns = ["name", "email", "mobile", "query_heading", "query_description", "status", "created_at"]
+        rows = [[r.get("name"), r.get("email"), r.get("mobile"), r.get("query_heading"),
+                 r.get("query_description"), "open", created_at] for r in records]
+        if keyed:
+            columns.append("idempotency_key")
+            for row, r in zip(rows, records):
+                row.append(r["idempotency_key"])
+        if not caps["query_id_auto_increment"]:
+            columns.insert(0, "query_id")
+            for row, new_id in zip(rows, self.allocator.reserve_block(len(rows))):
+                row.insert(0, new_id)
+        placeholders = ", ".join(["%s"] * len(columns))
+        if self.has_updated_at():
+            columns.append("updated_at")
+            placeholders += ", CURRENT_TIMESTAMP(6)"
+        insert_sql = f"INSERT INTO customer_data ({', '.join(columns)}) VALUES ({placeholders})"
+        if keyed:
+            # only a duplicate key is skipped (IGNORE would also turn data errors into warnings)
+            insert_sql += " ON DUPLICATE KEY UPDATE query_id = query_id"
+
+        try:
+            with self.db.connection() as conn:
+                conn.start_transaction()
+                cur = conn.cursor()
+                if keyed:
+                    cur.executemany(insert_sql, [tuple(row) for row in rows])
+                    keys = [r["idempotency_key"] for r in records]
+                    cur.execute(
+                        f"SELECT idempotency_key, query_id FROM customer_data "
+                        f"WHERE idempotency_key IN ({', '.join(['%s'] * len(keys))})", tuple(keys)
+                    )
+                    by_key = {k: int(qid) for k, qid in cur.fetchall()}
+                    missing = [k for k in keys if k not in by_key]
+                    if missing:
+                        # a query_id collision is skipped the same way
+                        raise RuntimeError(f"{len(missing)} complaint(s) were not inserted (query_id collision)")
+                    ids = [by_key[k] for k in keys]
+                elif caps["query_id_auto_increment"]:
+                    ids = []
+                    for row in rows:
+                        cur.execute(insert_sql, tuple(row))
+                        ids.append(int(cur.lastrowid))
+                else:
+                    cur.executemany(insert_sql, [tuple(row) for row in rows])
+                    ids = [int(row[0]) for row in rows]
+                conn.commit()
+                cur.close()
+        except Exception as e:
+            # ids inserted behind the sequence's back: catch up so the caller's retry gets fresh ones
+            if not caps["query_id_auto_increment"] and (is_duplicate_key(e) or isinstance(e, RuntimeError)):
+                self.allocator.resync()
+            raise
+
+        self.db.mark_written()
+        if self.cache is not None:
+            for new_id, r in zip(ids, records):
+                self.cache.invalidate_rows({"query_id": new_id, "name": r.get("name"), "email": r.get("email"),
+                                            "mobile": r.get("mobile"), "status": "open"})
+        if self.analytics is not None:
+            try:
+                self.analytics.catch_up()
+            except Exception as e:
+                log.warning("Analytics catch-up failed: %s", e)
+        return ids
+
+    def update_complaint_status(self, query_id, new_status, remarks=None, old_row=None):
+        """
+        Set status (closed_at = now when closing, NULL otherwise) and, if the
+        column exists, remarks. `old_row` (query_id/name/email/mobile/status as
+        displayed) lets the cache invalidation skip re-reading the row.
+        """
+        if self.cache is not None and old_row is None:
+            current = self.fetch_complaint(query_id)
+            old_row = current.iloc[0].to_dict() if not current.empty else {"query_id": int(query_id)}
+
+        # whole seconds, as DATETIME stores them, so analytics deltas match the row
+        closed_at = datetime.now().replace(microsecond=0) if str(new_status).lower() == "closed" else None
+        touch = ", updated_at = CURRENT_TIMESTAMP(6)" if self.has_updated_at() else ""
+        if self.has_remarks():
+            update_sql = f"UPDATE customer_data SET status = %s, closed_at = %s, remarks = %s{touch} WHERE query_id = %s"
+            params = (new_status, closed_at, remarks, int(query_id))
+        else:
+            update_sql = f"UPDATE customer_data SET status = %s, closed_at = %s{touch} WHERE query_id = %s"
+            params = (new_status, closed_at, int(query_id))
+        if self.analytics is not None:
+            self.analytics.ensure_tables()
+        has_archive = self.schema.has_archive()
+        columns = self.schema.capabilities()["columns"]
+        with self.db.connection() as conn:
+            cur_upd = conn.cursor()
+            before = None
+            if self.analytics is not None or has_archive:
+                # row change, archive restore and summary delta commit together
+                conn.start_transaction()
+            if self.analytics is not None:
+                watermark = self.analytics.lock_watermark(cur_upd)
+            if has_archive:
+                # an archived (closed) complaint being reopened or edited moves back first
+                restore_archived(cur_upd, [query_id], columns)
+            if self.analytics is not None:
+                cur_upd.execute(f"SELECT {', '.join(self.analytics.before_fields())} FROM customer_data "
+                                f"WHERE query_id = %s FOR UPDATE", (int(query_id),))
+                before = cur_upd.fetchone()
+            cur_upd.execute(update_sql, params)
+            if before is not None:
+                self.analytics.apply_status_change(cur_upd, watermark, query_id, before, new_status, closed_at)
+            conn.commit()
+            cur_upd.close()
+
+        self.db.mark_written()
+        # invalidate cached client lookups matching the row before and after the update
+        if self.cache is not None:
+            self.cache.invalidate_rows(old_row, dict(old_row, status=new_status))
+
+    def bulk_update_status(self, query_ids, new_status, remarks_template="", append_remarks=False):
+        """
+        Set one status (closed_at as in update_complaint_status) on many
+        complaints in a single transaction, optionally writing remarks rendered
+        from `remarks_template` per row (see render_remarks). Returns
+        (updated query_ids, {query_id: reason} for rows that were skipped).
+        A template that cannot be rendered raises ValueError before anything
+        is locked or written.
+
+        Rows are locked and checked first (missing rows) and
+        the rest go out in one executemany. If the database rejects that, each
+        row is retried behind its own savepoint so only the bad rows are left out.
+        """
+        query_ids = list(dict.fromkeys(int(q) for q in query_ids))
+        if not query_ids:
+            return [], {}
+        closed_at = datetime.now().replace(microsecond=0) if str(new_status).lower() == "closed" else None
+        with_remarks = self.has_remarks() and bool(remarks_template.strip())
+        if with_remarks:
+            check_remarks_template(remarks_template)
+        touch = ", updated_at = CURRENT_TIMESTAMP(6)" if self.has_updated_at() else ""
+        set_remarks = ", remarks = %s" if with_remarks else ""
+        update_sql = f"UPDATE customer_data SET status = %s, closed_at = %s{set_remarks}{touch} WHERE query_id = %s"
+        select_cols = "query_id, name, email, mobile, status, created_at, closed_at" + (", remarks" if self.has_remarks() else "")
+        if self.analytics is not None:
+            self.analytics.ensure_tables()
+            before_fields = self.analytics.before_fields()
+            select_cols += "".join(f", {c}" for c in before_fields[3:])
+
+        failures = {}
+        with self.db.connection() as conn:
+            conn.start_transaction()
+            cur = conn.cursor()
+            # same lock order as update_complaint_status: watermark, then the rows
+            watermark = self.analytics.lock_watermark(cur) if self.analytics is not None else None
+            if self.schema.has_archive():
+                restore_archived(cur, query_ids, self.schema.capabilities()["columns"])
+            cur.execute(f"SELECT {select_cols} FROM customer_data "
+                        f"WHERE query_id IN ({', '.join(['%s'] * len(query_ids))}) FOR UPDATE", tuple(query_ids))
+            names = [d[0] for d in cur.description]
+            current = {int(r[0]): dict(zip(names, r)) for r in cur.fetchall()}
+
+            batch = []  # (query_id, params)
+            for qid in query_ids:
+                row = current.get(qid)
+                if row is None:
+                    failures[qid] = "not found"
+                    continue
+                params = [new_status, closed_at]
+                if with_remarks:
+                    remarks = render_remarks(remarks_template, row, new_status)
+                    if append_remarks and row.get("remarks"):
+                        remarks = f"{row['remarks']}\n{remarks}"
+                    params.append(remarks)
+                batch.append((qid, tuple(params) + (qid,)))
+
+            updated = []
+            if batch:
+                cur.execute("SAVEPOINT bulk_update")
+                try:
+                    cur.executemany(update_sql, [params for _, params in batch])
+                    updated = [qid for qid, _ in batch]
+                except CONNECTION_ERRORS:
+                    raise
+                except Exception:
+                    cur.execute("ROLLBACK TO SAVEPOINT bulk_update")
+                    for qid, params in batch:
+                        cur.execute("SAVEPOINT bulk_row")
+                        try:
+                            cur.execute(update_sql, params)
+                            updated.append(qid)
+                        except CONNECTION_ERRORS:
+                            raise
+                        except Exception as e:
+                            cur.execute("ROLLBACK TO SAVEPOINT bulk_row")
+                            failures[qid] = str(e)
+            if self.analytics is not None and updated:
+                self.analytics.apply_status_changes(cur, watermark, [
+                    (qid, tuple(current[qid][c] for c in before_fields), new_status, closed_at) for qid in updated
+                ])
+            conn.commit()
+            cur.close()
+
+        self.db.mark_written()
+        if self.cache is not None:
+            for qid in updated:
+                old_row = {c: current[qid][c] for c in ("query_id", "name", "email", "mobile", "status")}
+                self.cache.invalidate_rows(old_row, dict(old_row, status=new_status))
+        return updated, failures
@@ -0,0 +1,471 @@
+"""
+Pooled MySQL connections for the Client Query app.
+
+Streamlit re-executes the page script on every widget interaction, so the app
+must not open a connection at import time. Instead one ConnectionManager is
+created per process (services.py caches it with st.cache_resource) and every
+helper checks a connection out of it for the duration of one unit of work:
+
+    with db.connection() as conn:
+        cur = conn.cursor()
+        ...
+
+Settings come from the environment (defaults match the local dev database):
+CQ_DB_HOST, CQ_DB_PORT, CQ_DB_USER, CQ_DB_PASSWORD, CQ_DB_NAME,
+CQ_DB_POOL_SIZE, CQ_DB_CHECKOUT_TIMEOUT, CQ_DB_HEALTH_CHECK_AFTER.
+
+When an Instrumentation object (instrumentation.py) is given, checked-out
+connections hand out timed cursors.
+
+Read replicas: with CQ_DB_REPLICAS="host[:port],..." set, the app uses a
+ReplicaRouter instead of a single pool. connection() still goes to the
+primary (writes, transactions, DDL); read_connection() goes to a replica,
+round robin. A session that just wrote reads from the primary for the next
+CQ_DB_STICKY_SECONDS (default 5) so it sees its own writes despite
+replication lag, and a replica that fails to hand out a connection is
+skipped for CQ_DB_REPLICA_RETRY_AFTER seconds (default 30). Replicas use the
+primary's user / password / database unless CQ_DB_REPLICA_USER /
+CQ_DB_REPLICA_PASSWORD are set. A plain ConnectionManager has the same
+read_connection() / mark_written() calls and serves everything itself.
+"""
+import contextvars
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+import mysql.connector
+from mysql.connector import errors
+
+log = logging.getLogger(__name__)
+
+# session the calling code works for (see db_session / ReplicaRouter)
+_db_session = contextvars.ContextVar("cq_db_session", default=None)
+
+
+def load_db_config():
+    """
+    Connection settings for mysql.connector.connect, read from the environment.
+    """
+    return {
+        "host": os.environ.get("CQ_DB_HOST", "localhost"),
+        "port": int(os.environ.get("CQ_DB_PORT", "3306")),
+        "user": os.environ.get("CQ_DB_USER", "Customer_queries"),
+        "password": os.environ.get("CQ_DB_PASSWORD", "Support"),
+        "database": os.environ.get("CQ_DB_NAME", "customer_queries"),
+        "autocommit": True,
+        "auth_plugin": "mysql_native_password",
+    }
+
+
+def load_pool_settings():
+    """
+    Pool sizing / timeouts, read from the environment.
+    """
+    return {
+        "pool_size": int(os.environ.get("CQ_DB_POOL_SIZE", "5")),
+        "checkout_timeout": float(os.environ.get("CQ_DB_CHECKOUT_TIMEOUT", "10")),
+        "health_check_after": float(os.environ.get("CQ_DB_HEALTH_CHECK_AFTER", "30")),
+    }
+
+
+def load_replica_settings():
+    """
+    Read replicas (CQ_DB_REPLICAS, comma separated host[:port]) and routing settings.
+    Each replica config is the primary's with host / port (and optionally user / password) replaced.
+    """
+    primary = load_db_config()
+    replicas = []
+    for entry in os.environ.get("CQ_DB_REPLICAS", "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, _, port = entry.partition(":")
+        replicas.append(dict(primary, host=host, port=int(port or primary["port"]),
+                             user=os.environ.get("CQ_DB_REPLICA_USER", primary["user"]),
+                             password=os.environ.get("CQ_DB_REPLICA_PASSWORD", primary["password"])))
+    return {
+        "replicas": replicas,
+        "sticky_seconds": float(os.environ.get("CQ_DB_STICKY_SECONDS", "5")),
+        "retry_after": float(os.environ.get("CQ_DB_REPLICA_RETRY_AFTER", "30")),
+    }
+
+
+@contextmanager
+def db_session(key):
+    """
+    Attribute the reads and writes in the block to session `key` (read-your-writes routing).
+    """
+    token = _db_session.set(key)
+    try:
+        yield
+    finally:
+        _db_session.reset(token)
+
+
+# errors that mean the connection itself is unusable (server gone, socket closed...)
+CONNECTION_ERRORS = (errors.OperationalError, errors.InterfaceError)
+
+
+class ConnectionManager:
+    """
+    A small thread-safe connection pool.
+
+    - connections are created lazily, up to pool_size
+    - a connection idle for longer than health_check_after seconds is pinged
+      on checkout and reconnected (or replaced) if the ping fails
+    - a connection that raised a connection-level error is discarded instead
+      of being returned to the pool
+    - stats() exposes counters for the Support page
+    """
+
+    def __init__(self, config=None, pool_size=5, checkout_timeout=10.0, health_check_after=30.0, connect=None,
+                 instrumentation=None):
+        self.config = dict(config or load_db_config())
+        self.pool_size = max(1, int(pool_size))
+        self.checkout_timeout = float(checkout_timeout)
+        self.health_check_after = float(health_check_after)
+        self._connect = connect or (lambda: mysql.connector.connect(**self.config))
+        self.instrumentation = instrumentation
+        self._idle = queue.LifoQueue()  # (connection, last_used) - LIFO keeps hot connections hot
+        self._lock = threading.Lock()
+        self._created = 0
+        self._metrics = {
+            "connections_created": 0,
+            "connections_discarded": 0,
+            "checkouts": 0,
+            "in_use": 0,
+            "peak_in_use": 0,
+            "waits": 0,
+            "wait_seconds_total": 0.0,
+            "checkout_timeouts": 0,
+            "health_check_failures": 0,
+            "reconnects": 0,
+        }
+
+    # ---------------- internals ----------------
+    def _bump(self, name, amount=1):
+        with self._lock:
+            self._metrics[name] += amount
+
+    def _open(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        self._bump("connections_created")
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created -= 1
+            self._metrics["connections_discarded"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _ensure_healthy(self, conn, last_used):
+        """
+        Ping connections that sat idle for a while; reconnect or replace dead ones.
+        """
+        if time.monotonic() - last_used < self.health_check_after:
+            return conn
+        try:
+            if conn.is_connected():
+                return conn
+        except Exception:
+            pass
+        self._bump("health_check_failures")
+        try:
+            conn.reconnect(attempts=2, delay=0.2)
+            self._bump("reconnects")
+            return conn
+        except Exception:
+            self._discard(conn)
+            with self._lock:
+                self._created += 1
+            return self._open()
+
+    def _checkout(self):
+        # 1) reuse an idle connection
+        try:
+            conn, last_used = self._idle.get_nowait()
+            return self._ensure_healthy(conn, last_used)
+        except queue.Empty:
+            pass
+
+        # 2) grow the pool
+        with self._lock:
+            can_grow = self._created < self.pool_size
+            if can_grow:
+                self._created += 1
+        if can_grow:
+            return self._open()
+
+        # 3) wait for a connection to be returned
+        started = time.monotonic()
+        self._bump("waits")
+        try:
+            conn, last_used = self._idle.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            self._bump("checkout_timeouts")
+            raise errors.PoolError(
+                f"No database connection available after {self.checkout_timeout:.0f}s "
+                f"(pool size {self.pool_size})"
+            )
+        finally:
+            self._bump("wait_seconds_total", time.monotonic() - started)
+        return self._ensure_healthy(conn, last_used)
+
+    def _checkin(self, conn, broken):
+        if broken:
+            self._discard(conn)
+            return
+        try:
+            # never hand the next user a half-finished transaction
+            if getattr(conn, "in_transaction", False):
+                conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    # ---------------- public API ----------------
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for one unit of work and return it to the pool afterwards.
+        """
+        conn = self._checkout()
+        with self._lock:
+            self._metrics["checkouts"] += 1
+            self._metrics["in_use"] += 1
+            self._metrics["peak_in_use"] = max(self._metrics["peak_in_use"], self._metrics["in_use"])
+        broken = False
+        try:
+            yield self.instrumentation.wrap_connection(conn) if self.instrumentation else conn
+        except CONNECTION_ERRORS:
+            broken = True
+            raise
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self._bump("in_use", -1)
+            self._checkin(conn, broken)
+
+    # a single server is its own replica: same calls as ReplicaRouter
+    def read_connection(self):
+        return self.connection()
+
+    def current_session(self):
+        return _db_session.get()
+
+    def mark_written(self, session=None):
+        pass
+
+    def is_sticky(self):
+        return False
+
+    def replicas_catching_up(self):
+        return False
+
+    def health_check(self):
+        """
+        Run SELECT 1 on a pooled connection. Returns (ok, latency_ms, error_message).
+        """
+        started = time.monotonic()
+        try:
+            with self.connection() as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT 1")
+                cur.fetchall()
+                cur.close()
+            return True, (time.monotonic() - started) * 1000.0, ""
+        except Exception as e:
+            return False, (time.monotonic() - started) * 1000.0, str(e)
+
+    def stats(self):
+        """
+        Snapshot of the pool counters.
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["open_connections"] = self._created
+        snapshot["idle"] = self._idle.qsize()
+        snapshot["pool_size"] = self.pool_size
+        return snapshot
+
+    def close_all(self):
+        """
+        Close every idle connection (checked-out ones are closed when returned broken or left to GC).
+        """
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+class ReplicaRouter:
+    """
+    Splits reads from writes across a primary pool and replica pools
+    (ConnectionManager each).
+
+    - connection() is the primary: every write, transaction and schema check
+    - read_connection() is the next replica that is up, or the primary when
+      there are none, when all are down, or when the calling session wrote
+      within sticky_seconds (mark_written); a replica that cannot be reached
+      is skipped for retry_after seconds, one whose pool is merely exhausted
+      only sends that read to the primary
+    - the calling session is the one bound with db_session(); otherwise
+      `session_key()` (e.g. the Streamlit session id), otherwise none
+    """
+
+    def __init__(self, primary, replicas=(), sticky_seconds=5.0, retry_after=30.0, session_key=None):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.sticky_seconds = float(sticky_seconds)
+        self.retry_after = float(retry_after)
+        self.session_key = session_key
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+        self._down_until = {}   # replica index -> monotonic time it may be tried again
+        self._written = {}      # session -> monotonic time of its last write
+        self._last_write = None
+        self._metrics = {"replica_reads": 0, "primary_reads": 0, "sticky_reads": 0, "replica_failovers": 0,
+                         "replica_busy": 0}
+
+    # ---------------- sessions ----------------
+    def current_session(self):
+        session = _db_session.get()
+        if session is None and self.session_key is not None:
+            session = self.session_key()
+        return session
+
+    def mark_written(self, session=None):
+        """
+        Record a write by `session` (default: the calling one): its reads go to the primary for sticky_seconds.
+        """
+        session = session if session is not None else self.current_session()
+        now = time.monotonic()
+        with self._lock:
+            self._last_write = now
+            if session is not None:
+                self._written[session] = now
+            if len(self._written) > 1024:
+                cutoff = now - self.sticky_seconds
+                self._written = {k: t for k, t in self._written.items() if t >= cutoff}
+
+    def _sticky(self):
+        session = self.current_session()
+        if session is None:
+            return False
+        with self._lock:
+            wrote = self._written.get(session)
+        return wrote is not None and time.monotonic() - wrote < self.sticky_seconds
+
+    def is_sticky(self):
+        """
+        True while the calling session's reads are pinned to the primary after its own write.
+        """
+        return bool(self.replicas) and self._sticky()
+
+    def replicas_catching_up(self):
+        """
+        True within sticky_seconds of any write: replicas may not have it yet.
+        """
+        with self._lock:
+            last = self._last_write
+        return bool(self.replicas) and last is not None and time.monotonic() - last < self.sticky_seconds
+
+    # ---------------- routing ----------------
+    def _pick_replica(self):
+        if not self.replicas:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            up = [i for i in range(len(self.replicas)) if self._down_until.get(i, 0.0) <= now]
+            if not up:
+                return None
+            return up[next(self._next) % len(up)]
+
+    def _mark_down(self, index, error):
+        log.warning("Replica %d unavailable, reading from the primary for %gs: %s", index, self.retry_after, error)
+        with self._lock:
+            self._down_until[index] = time.monotonic() + self.retry_after
+            self._metrics["replica_failovers"] += 1
+
+    def _bump(self, name):
+        with self._lock:
+            self._metrics[name] += 1
+
+    def connection(self):
+        return self.primary.connection()
+
+    @contextmanager
+    def read_connection(self):
+        """
+        Check out a connection for read-only work (see the class docstring for where it comes from).
+        """
+        sticky = self._sticky()
+        index = None if sticky else self._pick_replica()
+        with ExitStack() as stack:
+            conn = None
+            if index is not None:
+                try:
+                    conn = stack.enter_context(self.replicas[index].connection())
+                except errors.PoolError as e:
+                    # the replica is up, its pool is just exhausted: only this read goes to the primary
+                    log.info("Replica %d busy, reading from the primary: %s", index, e)
+                    self._bump("replica_busy")
+                    index = None
+                except errors.Error as e:
+                    self._mark_down(index, e)
+                    index = None
+            if conn is None:
+                conn = stack.enter_context(self.primary.connection())
+            self._bump("replica_reads" if index is not None else "sticky_reads" if sticky else "primary_reads")
+            try:
+                yield conn
+            except CONNECTION_ERRORS as e:
+                if index is not None:
+                    self._mark_down(index, e)
+                raise
+
+    # ---------------- pool API ----------------
+    def health_check(self):
+        return self.primary.health_check()
+
+    def replica_health(self):
+        """
+        [(replica index, ok, latency_ms, error_message)] for every replica.
+        """
+        return [(i,) + replica.health_check() for i, replica in enumerate(self.replicas)]
+
+    def stats(self):
+        """
+        The primary pool's counters plus routing counters and replicas currently up.
+        """
+        snapshot = self.primary.stats()
+        now = time.monotonic()
+        with self._lock:
+            snapshot.update(self._metrics)
+            snapshot["replicas"] = len(self.replicas)
+            snapshot["replicas_up"] = sum(1 for i in range(len(self.replicas)) if self._down_until.get(i, 0.0) <= now)
+        return snapshot
+
+    def close_all(self):
+        self.primary.close_all()
+        for replica in self.replicas:
+            replica.close_all()
@@ -0,0 +1,186 @@
+"""
+Streaming export of complaint views to CSV or Parquet.
+
+Exports used to mean copying out of st.dataframe, and a full export through
+the page code would fetchall() the whole result into a DataFrame first.
+Here the view's own query (the SQL builders in data_access.py, without the
+page LIMIT) runs on an unbuffered cursor and rows are pulled with fetchmany
+in chunks of CQ_EXPORT_CHUNK_ROWS (default 5000). Each chunk is written out
+as CSV lines or as one Parquet row group before the next is read, so memory
+use does not grow with the result size.
+
+Parquet needs pyarrow (optional; CSV always works):
+
+    python export.py --status closed --format parquet --out closed.parquet
+    python export.py --email someone@example.com --out someone.csv
+"""
+import argparse
+import codecs
+import csv
+import logging
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+from formats import TIMESTAMP_COLUMNS
+
+log = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+# exports below this size stay in memory, larger ones spill to a temp file
+SPOOL_BYTES = 8 * 1024 * 1024
+
+
+def load_export_settings():
+    return {"chunk_rows": int(os.environ.get("CQ_EXPORT_CHUNK_ROWS", "5000"))}
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def available_formats():
+    return [f for f in EXPORT_FORMATS if f != "parquet" or parquet_available()]
+
+
+def stream_rows(db, sql, params, chunk_rows=5000):
+    """
+    Yield (columns, rows) chunks of a query read through an unbuffered cursor
+    (on a replica when there are any); the pooled connection is held until
+    the generator is exhausted or closed.
+    """
+    with db.read_connection() as conn:
+        cur = conn.cursor(buffered=False)
+        try:
+            cur.execute(sql, params)
+            cols = [d[0] for d in cur.description]
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield cols, rows
+        finally:
+            # an export abandoned half-way leaves rows on the wire; drain them before pooling the connection
+            try:
+                conn.consume_results()
+            except Exception:
+                pass
+            cur.close()
+
+
+def _as_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def write_csv(out, chunks):
+    """
+    Write chunks as UTF-8 CSV (header first) to the binary file `out`. Returns rows written.
+    """
+    text = codecs.getwriter("utf-8")(out)
+    writer = csv.writer(text)
+    written, header = 0, False
+    for cols, rows in chunks:
+        if not header:
+            writer.writerow(cols)
+            header = True
+        writer.writerows(["" if v is None else v for v in row] for row in rows)
+        written += len(rows)
+    return written
+
+
+def _arrow_type(pa, column):
+    if column == "query_id":
+        return pa.int64()
+    if column in TIMESTAMP_COLUMNS:
+        return pa.timestamp("us")
+    return pa.string()
+
+
+def write_parquet(out, chunks):
+    """
+    Write chunks to the binary file `out` as Parquet, one row group per chunk. Returns rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer, written = None, 0
+    try:
+        for cols, rows in chunks:
+            if writer is None:
+                schema = pa.schema([(c, _arrow_type(pa, c)) for c in cols])
+                writer = pq.ParquetWriter(out, schema)
+            arrays = []
+            for i, field in enumerate(schema):
+                values = [row[i] for row in rows]
+                if pa.types.is_timestamp(field.type):
+                    values = [_as_datetime(v) for v in values]
+                elif pa.types.is_string(field.type):
+                    values = [None if v is None else str(v) for v in values]
+                arrays.append(pa.array(values, type=field.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            written += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def export_query(db, sql, params, fmt="csv", out=None, chunk_rows=5000):
+    """
+    Stream a query into `out` (a binary file; a spooled temp file when None)
+    as `fmt`. Returns (file rewound to the start, rows written).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    out = out if out is not None else tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    write = write_parquet if fmt == "parquet" else write_csv
+    written = write(out, stream_rows(db, sql, params, chunk_rows))
+    out.flush()
+    out.seek(0)
+    log.info("Exported %d row(s) as %s", written, fmt)
+    return out, written
+
+
+def export_file_name(view, fmt):
+    return f"complaints_{view}_{datetime.now():%Y%m%d_%H%M%S}.{fmt}"
+
+
+def main(argv=None):
+    from db import ConnectionManager, load_db_config
+    from data_access import ComplaintStore
+
+    parser = argparse.ArgumentParser(description="Export complaints to CSV / Parquet")
+    parser.add_argument("--status", default="all", help='status filter ("all", "open", "closed", ...)')
+    parser.add_argument("--email")
+    parser.add_argument("--mobile")
+    parser.add_argument("--search", help="Support search box text (ranked results)")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--chunk-rows", type=int, default=load_export_settings()["chunk_rows"])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    db = ConnectionManager(load_db_config(), pool_size=1)
+    try:
+        store = ComplaintStore(db)
+        if args.email or args.mobile:
+            sql, params = store.lookup_export_sql(None, args.email, args.mobile, args.status)
+        else:
+            sql, params = store.support_export_sql(args.status, args.search)
+        with open(args.out, "wb") as out:
+            _, written = export_query(db, sql, params, args.format, out, args.chunk_rows)
+        print(f"Wrote {written} complaint(s) to {args.out}")
+    finally:
+        db.close_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+"""
+Timestamp columns and their display formats.
+
+Kept apart from shaping.py (which needs pandas) so the export module and the
+shared widgets in ui.py can use them without loading pandas.
+"""
+TIMESTAMP_COLUMNS = ("created_at", "closed_at", "updated_at")
+DISPLAY_TS_FORMAT = "%d-%m-%Y %H:%M:%S"
+# same format for st.column_config.DatetimeColumn (moment.js syntax)
+DISPLAY_DATETIME_FORMAT = "DD-MM-YYYY HH:mm:ss"
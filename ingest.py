@@ -0,0 +1,348 @@
+"""
+Bulk complaint ingestion from CSV / JSONL / JSON exports.
+
+    python ingest.py exports/callcentre.csv
+    python ingest.py exports/email.jsonl --batch-size 5000 --rejects rejects.csv
+    python ingest.py exports/webform.json     # a single JSON array of records
+
+The file is streamed record by record (never loaded whole), validated with the
+same rules as the "Raise Query" form, and inserted in batches with
+executemany, one transaction per batch. Progress is checkpointed in the
+ingest_checkpoints table inside the same transaction as the batch, so after a
+failure re-running the same command resumes after the last committed batch
+without duplicating rows (a batch's rejects are written to --rejects when
+its checkpoint commits, so they are not repeated either). Use --restart to
+ignore an existing checkpoint.
+
+Recognised fields: name, email, mobile, query_heading, query_description
+(required) and status, created_at, closed_at, remarks (optional).
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from analytics import AnalyticsSummary
+from db import ConnectionManager, load_db_config
+from schema import SchemaInspector, QueryIdAllocator
+from validation import missing_required_fields
+
+CHECKPOINT_TABLE = "ingest_checkpoints"
+FIELDS = ["name", "email", "mobile", "query_heading", "query_description", "status", "created_at", "closed_at", "remarks"]
+
+
+# ---------------- readers ----------------
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for record in csv.DictReader(f):
+            yield record
+
+def _object_or_error(value, where):
+    if isinstance(value, dict):
+        return value
+    return {"_error": f"{where}: expected a JSON object, got {type(value).__name__}"}
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield _object_or_error(json.loads(line), f"line {line_no}")
+            except ValueError as e:
+                yield {"_error": f"line {line_no}: invalid JSON ({e})"}
+
+def read_json_array(path, chunk_size=1 << 16):
+    """
+    Elements of a file holding one JSON array, decoded one at a time as the
+    file is read (the array is never loaded whole). A syntax error ends the
+    file with one error record: there is no way to resync after it.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8-sig") as f:
+        buf, pos, eof = "", 0, False
+        state = "start"  # "[" expected, then a value, then "," or "]"
+        item_no = 0
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos >= len(buf):
+                if eof:
+                    if state != "done":
+                        yield {"_error": f"item {item_no + 1}: unexpected end of file"}
+                    return
+                buf, pos = f.read(chunk_size), 0
+                eof = not buf
+                continue
+            if state == "done":
+                yield {"_error": f"unexpected data after the JSON array (item {item_no})"}
+                return
+            char = buf[pos]
+            if state == "start":
+                if char != "[":
+                    yield {"_error": "not a JSON array"}
+                    return
+                pos, state = pos + 1, "first"
+            elif state == "next":
+                if char not in ",]":
+                    yield {"_error": f"item {item_no + 1}: expected ',' or ']'"}
+                    return
+                pos, state = pos + 1, "value" if char == "," else "done"
+            elif state == "first" and char == "]":
+                pos, state = pos + 1, "done"
+            else:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except ValueError as e:
+                    value, end = e, None
+                if (end is None or end == len(buf)) and not eof:
+                    # the value may continue in the next chunk
+                    more = f.read(chunk_size)
+                    buf, pos, eof = buf[pos:] + more, 0, not more
+                    continue
+                item_no += 1
+                if end is None:
+                    yield {"_error": f"item {item_no}: invalid JSON ({value})"}
+                    return
+                yield _object_or_error(value, f"item {item_no}")
+                pos, state = end, "next"
+
+def _json_is_array(path):
+    with open(path, encoding="utf-8-sig") as f:
+        for line in f:
+            if line.strip():
+                return line.lstrip().startswith("[")
+    return False
+
+def open_records(path, fmt=None):
+    if fmt is None:
+        lower = path.lower()
+        if lower.endswith(".json"):
+            # a .json export is usually one array, but may be JSON Lines too
+            fmt = "json" if _json_is_array(path) else "jsonl"
+        else:
+            fmt = "jsonl" if lower.endswith((".jsonl", ".ndjson")) else "csv"
+    if fmt == "json":
+        return read_json_array(path)
+    return read_jsonl(path) if fmt == "jsonl" else read_csv(path)
+
+def parse_timestamp(value):
+    if value in (None, ""):
+        return None
+    if isinstance(value, datetime):
+        return value
+    text = str(value).strip()
+    for fmt in ("%d-%m-%Y %H:%M:%S", "%Y-%m-%d %H:%M:%S", "%d-%m-%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    return datetime.fromisoformat(text)
+
+def prepare(record):
+    """
+    Validate and normalise one input record. Returns (values_tuple, None) or (None, reason).
+    """
+    if not isinstance(record, dict):
+        return None, f"expected a record, got {type(record).__name__}"
+    if "_error" in record:
+        return None, record["_error"]
+    missing = missing_required_fields(record)
+    if missing:
+        return None, "missing required fields: " + ", ".join(missing)
+    try:
+        created_at = parse_timestamp(record.get("created_at")) or datetime.now()
+        closed_at = parse_timestamp(record.get("closed_at"))
+    except ValueError as e:
+        return None, f"bad timestamp: {e}"
+    status = str(record.get("status") or "").strip() or "open"
+    return (
+        str(record["name"]).strip(),
+        str(record["email"]).strip(),
+        str(record["mobile"]).strip(),
+        str(record["query_heading"]).strip(),
+        str(record["query_description"]).strip(),
+        status,
+        created_at,
+        closed_at,
+        record.get("remarks") or None,
+    ), None
+
+
+# ---------------- checkpoints ----------------
+def ensure_checkpoint_table(db):
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+                source VARCHAR(255) NOT NULL PRIMARY KEY,
+                records_done BIGINT NOT NULL,
+                inserted BIGINT NOT NULL,
+                rejected BIGINT NOT NULL,
+                updated_at DATETIME NOT NULL
+            )
+        """)
+        cur.close()
+
+def load_checkpoint(db, source):
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT records_done, inserted, rejected FROM {CHECKPOINT_TABLE} WHERE source = %s", (source,))
+        row = cur.fetchone()
+        cur.close()
+    return tuple(int(v) for v in row) if row else (0, 0, 0)
+
+def reset_checkpoint(db, source):
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE source = %s", (source,))
+        cur.close()
+
+
+# ---------------- loader ----------------
+def insert_batch(db, schema, allocator, source, rows, records_done, inserted, rejected):
+    """
+    Insert one batch and advance the checkpoint in a single transaction.
+    """
+    caps = schema.capabilities()
+    cols = ["name", "email", "mobile", "query_heading", "query_description", "status", "created_at", "closed_at"]
+    if caps["has_remarks"]:
+        cols.append("remarks")
+    else:
+        rows = [r[:-1] for r in rows]
+    if not caps["query_id_auto_increment"] and rows:
+        ids = allocator.reserve_block(len(rows))
+        rows = [(qid,) + r for qid, r in zip(ids, rows)]
+        cols = ["query_id"] + cols
+
+    values = ["%s"] * len(cols)
+    if caps["has_updated_at"]:
+        # database clock, like the app's writes (the Support change feed polls on it)
+        cols.append("updated_at")
+        values.append("CURRENT_TIMESTAMP(6)")
+    insert_sql = f"INSERT INTO customer_data ({', '.join(cols)}) VALUES ({', '.join(values)})"
+    with db.connection() as conn:
+        conn.start_transaction()
+        cur = conn.cursor()
+        if rows:
+            cur.executemany(insert_sql, rows)
+        cur.execute(
+            f"INSERT INTO {CHECKPOINT_TABLE} (source, records_done, inserted, rejected, updated_at) "
+            f"VALUES (%s, %s, %s, %s, %s) "
+            f"ON DUPLICATE KEY UPDATE records_done = VALUES(records_done), inserted = VALUES(inserted), "
+            f"rejected = VALUES(rejected), updated_at = VALUES(updated_at)",
+            (source, records_done, inserted, rejected, datetime.now())
+        )
+        conn.commit()
+        cur.close()
+
+def ingest(db, path, fmt=None, batch_size=1000, source=None, rejects_path=None, restart=False, out=sys.stderr):
+    """
+    Stream `path` into customer_data. Returns a summary dict.
+    """
+    source = source or os.path.abspath(path)
+    schema = SchemaInspector(db)
+    allocator = QueryIdAllocator(db, block_size=batch_size)
+    ensure_checkpoint_table(db)
+    if restart:
+        reset_checkpoint(db, source)
+    skip, inserted, rejected = load_checkpoint(db, source)
+    if skip:
+        print(f"Resuming {source} after {skip} records ({inserted} inserted, {rejected} rejected)", file=out)
+
+    rejects_file = rejects_writer = None
+    if rejects_path:
+        rejects_file = open(rejects_path, "a", newline="", encoding="utf-8")
+        rejects_writer = csv.writer(rejects_file)
+
+    started = time.monotonic()
+    inserted_this_run = 0
+    records_done = skip
+    batch = []
+    # rejects of the batch being built, written once its checkpoint commits (a resume re-reads them)
+    batch_rejects = []
+
+    def write_rejects():
+        if rejects_writer and batch_rejects:
+            rejects_writer.writerows(batch_rejects)
+            rejects_file.flush()
+        batch_rejects.clear()
+
+    try:
+        for index, record in enumerate(open_records(path, fmt)):
+            if index < skip:
+                continue
+            values, reason = prepare(record)
+            records_done += 1
+            if values is None:
+                rejected += 1
+                if rejects_writer:
+                    batch_rejects.append([index + 1, reason] + [record.get(f, "") for f in FIELDS])
+            else:
+                batch.append(values)
+            if len(batch) >= batch_size:
+                insert_batch(db, schema, allocator, source, batch, records_done, inserted + len(batch), rejected)
+                write_rejects()
+                inserted += len(batch)
+                inserted_this_run += len(batch)
+                batch = []
+                elapsed = time.monotonic() - started
+                print(f"{records_done} records read, {inserted} inserted, {rejected} rejected "
+                      f"({inserted_this_run / elapsed if elapsed else 0:.0f} rows/s)", file=out)
+        # final partial batch (also records trailing rejects in the checkpoint)
+        if batch or records_done > skip:
+            insert_batch(db, schema, allocator, source, batch, records_done, inserted + len(batch), rejected)
+            write_rejects()
+            inserted += len(batch)
+            inserted_this_run += len(batch)
+    finally:
+        if rejects_file:
+            rejects_file.close()
+
+    elapsed = time.monotonic() - started
+    summary = {
+        "source": source,
+        "records": records_done,
+        "inserted": inserted,
+        "rejected": rejected,
+        "inserted_this_run": inserted_this_run,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(inserted_this_run / elapsed, 1) if elapsed else 0.0,
+    }
+    print(f"Done: {summary['inserted_this_run']} rows inserted in {summary['seconds']}s "
+          f"({summary['rows_per_sec']} rows/s), {rejected} rejected in total", file=out)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-load complaints from CSV/JSONL/JSON exports into customer_data.")
+    parser.add_argument("path", help="CSV, JSONL or JSON (one array) file")
+    parser.add_argument("--format", choices=["csv", "jsonl", "json"],
+                        help="input format (default: from the file extension; .json is checked for an array)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows per executemany/transaction (default 1000)")
+    parser.add_argument("--source", help="checkpoint name (default: absolute path of the file)")
+    parser.add_argument("--rejects", help="append rejected records with the reason to this CSV file")
+    parser.add_argument("--restart", action="store_true", help="ignore any existing checkpoint and start from the top")
+    args = parser.parse_args(argv)
+
+    db = ConnectionManager(load_db_config(), pool_size=1)
+    try:
+        summary = ingest(db, args.path, args.format, max(1, args.batch_size), args.source, args.rejects, args.restart)
+        if summary["inserted_this_run"]:
+            # fold the new rows into the support analytics in one aggregate pass
+            try:
+                AnalyticsSummary(db).catch_up()
+            except Exception as e:
+                print(f"Analytics catch-up failed ({e}); run `python analytics.py catch-up`", file=sys.stderr)
+    finally:
+        db.close_all()
+    print(json.dumps(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""
+Timing instrumentation for SQL, result shaping and rendering.
+
+One Instrumentation object per process records:
+
+- per-statement query stats (executions, execute/fetch time, rows) for every
+  cursor handed out by the connection pool (see ConnectionManager's
+  `instrumentation` argument)
+- a slow-query log for statements over CQ_SLOW_QUERY_MS (default 200 ms)
+- named spans (shaping, rendering, ...) grouped per Streamlit rerun, so a
+  rerun can be broken down into where its time went
+
+Everything can be exported as JSON or Prometheus text into CQ_METRICS_DIR
+(default ./metrics): on demand from the Support diagnostics page, and every
+CQ_METRICS_EXPORT_EVERY seconds when that is set.
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+_current_run = contextvars.ContextVar("cq_current_run", default=None)
+
+
+def load_instrumentation_settings():
+    return {
+        "slow_query_ms": float(os.environ.get("CQ_SLOW_QUERY_MS", "200")),
+        "metrics_dir": os.environ.get("CQ_METRICS_DIR", "metrics"),
+        "export_every": float(os.environ.get("CQ_METRICS_EXPORT_EVERY", "0")),
+    }
+
+
+def normalize_sql(sql, limit=160):
+    """
+    Whitespace-collapsed statement text used as the stats key.
+    """
+    text = re.sub(r"\s+", " ", str(sql)).strip()
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def _prom_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+class Instrumentation:
+    """
+    Thread-safe collector for query stats, spans and per-rerun breakdowns.
+    """
+
+    def __init__(self, slow_query_ms=200.0, metrics_dir="metrics", export_every=0.0, max_runs=200, max_slow=200):
+        self.slow_query_ms = float(slow_query_ms)
+        self.metrics_dir = metrics_dir
+        self.export_every = float(export_every)
+        self._lock = threading.Lock()
+        self._queries = {}   # normalized sql -> stats dict
+        self._spans = {}     # span name -> {"count", "total_ms", "max_ms"}
+        self._runs = deque(maxlen=max_runs)
+        self._slow = deque(maxlen=max_slow)
+        self._last_export = time.monotonic()
+
+    # ---------------- reruns ----------------
+    def begin_run(self, label):
+        """
+        Start a new rerun record for the calling script thread. A run's total is
+        measured up to its last recorded span, so no explicit end call is needed.
+        """
+        run = {"label": label, "started_at": datetime.now().isoformat(timespec="seconds"),
+               "_t0": time.perf_counter(), "total_ms": 0.0, "spans": []}
+        _current_run.set(run)
+        with self._lock:
+            self._runs.append(run)
+        self._maybe_export()
+        return run
+
+    def _attach(self, name, ms, rows=None):
+        run = _current_run.get()
+        if run is None:
+            return
+        span = {"name": name, "ms": round(ms, 3)}
+        if rows is not None:
+            span["rows"] = rows
+        run["spans"].append(span)
+        run["total_ms"] = round((time.perf_counter() - run["_t0"]) * 1000.0, 3)
+
+    # ---------------- spans ----------------
+    def record_span(self, name, ms, rows=None):
+        with self._lock:
+            agg = self._spans.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            agg["count"] += 1
+            agg["total_ms"] += ms
+            agg["max_ms"] = max(agg["max_ms"], ms)
+        self._attach(name, ms, rows)
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_span(name, (time.perf_counter() - started) * 1000.0)
+
+    # ---------------- queries ----------------
+    def record_query(self, sql, execute_ms, fetch_ms=0.0, rows=0):
+        key = normalize_sql(sql)
+        total = execute_ms + fetch_ms
+        with self._lock:
+            q = self._queries.setdefault(key, {"count": 0, "execute_ms": 0.0, "fetch_ms": 0.0,
+                                               "max_ms": 0.0, "rows": 0, "slow": 0})
+            q["count"] += 1
+            q["execute_ms"] += execute_ms
+            q["fetch_ms"] += fetch_ms
+            q["max_ms"] = max(q["max_ms"], total)
+            q["rows"] += rows
+            if total >= self.slow_query_ms:
+                q["slow"] += 1
+                self._slow.append({"at": datetime.now().isoformat(timespec="seconds"), "sql": key,
+                                   "ms": round(total, 3), "rows": rows})
+        if total >= self.slow_query_ms:
+            log.warning("Slow query (%.1f ms, %d rows): %s", total, rows, key)
+        self._attach("sql: " + key[:60], total, rows)
+
+    def wrap_connection(self, conn):
+        return InstrumentedConnection(conn, self)
+
+    # ---------------- reporting ----------------
+    def snapshot(self):
+        with self._lock:
+            queries = {k: dict(v) for k, v in self._queries.items()}
+            spans = {k: dict(v) for k, v in self._spans.items()}
+            runs = [{k: v for k, v in r.items() if not k.startswith("_")} for r in self._runs]
+            slow = list(self._slow)
+        return {"generated_at": datetime.now().isoformat(timespec="seconds"),
+                "slow_query_ms": self.slow_query_ms,
+                "queries": queries, "spans": spans, "runs": runs, "slow_queries": slow}
+
+    def prometheus_text(self, extra_gauges=None):
+        """
+        Prometheus text exposition of the counters (plus any {name: value} gauges).
+        """
+        snap = self.snapshot()
+        lines = [
+            "# HELP cq_query_executions_total Statements executed.",
+            "# TYPE cq_query_executions_total counter",
+        ]
+        for sql, q in snap["queries"].items():
+            lines.append(f'cq_query_executions_total{{query="{_prom_label(sql)}"}} {q["count"]}')
+        lines += ["# HELP cq_query_seconds_total Time spent executing and fetching, by statement.",
+                  "# TYPE cq_query_seconds_total counter"]
+        for sql, q in snap["queries"].items():
+            label = _prom_label(sql)
+            lines.append(f'cq_query_seconds_total{{query="{label}",phase="execute"}} {q["execute_ms"] / 1000.0:.6f}')
+            lines.append(f'cq_query_seconds_total{{query="{label}",phase="fetch"}} {q["fetch_ms"] / 1000.0:.6f}')
+        lines += ["# HELP cq_query_rows_total Rows fetched, by statement.", "# TYPE cq_query_rows_total counter"]
+        for sql, q in snap["queries"].items():
+            lines.append(f'cq_query_rows_total{{query="{_prom_label(sql)}"}} {q["rows"]}')
+        lines += ["# HELP cq_slow_queries_total Statements slower than the slow-query threshold.",
+                  "# TYPE cq_slow_queries_total counter"]
+        for sql, q in snap["queries"].items():
+            lines.append(f'cq_slow_queries_total{{query="{_prom_label(sql)}"}} {q["slow"]}')
+        lines += ["# HELP cq_span_seconds_total Time spent in named spans (shaping, rendering...).",
+                  "# TYPE cq_span_seconds_total counter"]
+        for name, sp in snap["spans"].items():
+            lines.append(f'cq_span_seconds_total{{span="{_prom_label(name)}"}} {sp["total_ms"] / 1000.0:.6f}')
+            lines.append(f'cq_span_count_total{{span="{_prom_label(name)}"}} {sp["count"]}')
+        for name, value in (extra_gauges or {}).items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory=None, extra_gauges=None):
+        """
+        Write metrics.json and metrics.prom into `directory`; returns the two paths.
+        """
+        directory = directory or self.metrics_dir
+        os.makedirs(directory, exist_ok=True)
+        json_path = os.path.join(directory, "metrics.json")
+        prom_path = os.path.join(directory, "metrics.prom")
+        for path, payload in ((json_path, json.dumps(self.snapshot(), indent=2, default=str)),
+                              (prom_path, self.prometheus_text(extra_gauges))):
+            tmp = path + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(payload)
+            os.replace(tmp, path)  # readers never see a half-written file
+        with self._lock:
+            self._last_export = time.monotonic()
+        return json_path, prom_path
+
+    def _maybe_export(self):
+        if self.export_every <= 0 or time.monotonic() - self._last_export < self.export_every:
+            return
+        try:
+            self.export()
+        except Exception as e:
+            log.warning("Metrics export failed: %s", e)
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+            self._spans.clear()
+            self._runs.clear()
+            self._slow.clear()
+
+
+# ---------------- DB-API wrappers ----------------
+class InstrumentedCursor:
+    """
+    Cursor proxy timing execute/executemany and the fetch calls that follow.
+    """
+
+    def __init__(self, cursor, instr):
+        self._cursor = cursor
+        self._instr = instr
+        self._pending = None  # [sql, execute_ms, fetch_ms, rows] until the result is consumed
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _flush(self):
+        if self._pending is not None:
+            sql, execute_ms, fetch_ms, rows = self._pending
+            self._pending = None
+            self._instr.record_query(sql, execute_ms, fetch_ms, rows)
+
+    def execute(self, sql, params=None, *args, **kwargs):
+        self._flush()
+        started = time.perf_counter()
+        result = self._cursor.execute(sql, params, *args, **kwargs) if params is not None \
+            else self._cursor.execute(sql, *args, **kwargs)
+        self._pending = [sql, (time.perf_counter() - started) * 1000.0, 0.0, 0]
+        if self._cursor.description is None:
+            self._flush()  # no result set to fetch (INSERT/UPDATE/DDL)
+        return result
+
+    def executemany(self, sql, seq_params, *args, **kwargs):
+        self._flush()
+        started = time.perf_counter()
+        result = self._cursor.executemany(sql, seq_params, *args, **kwargs)
+        self._instr.record_query(sql, (time.perf_counter() - started) * 1000.0)
+        return result
+
+    def _timed_fetch(self, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        if self._pending is not None:
+            self._pending[2] += (time.perf_counter() - started) * 1000.0
+        return result
+
+    def fetchall(self):
+        rows = self._timed_fetch(self._cursor.fetchall)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+        self._flush()
+        return rows
+
+    def fetchone(self):
+        row = self._timed_fetch(self._cursor.fetchone)
+        if self._pending is not None:
+            self._pending[3] += 1 if row is not None else 0
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._timed_fetch(self._cursor.fetchmany, size)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+            if not rows:
+                self._flush()
+        return rows
+
+    def close(self):
+        self._flush()
+        return self._cursor.close()
+
+
+class InstrumentedConnection:
+    """
+    Connection proxy whose cursors are InstrumentedCursors.
+    """
+
+    def __init__(self, conn, instr):
+        self._conn = conn
+        self._instr = instr
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._instr)
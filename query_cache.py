@@ -0,0 +1,136 @@
+"""
+In-memory result cache for the client complaint lookups.
+
+fetch_open_complaints / fetch_complaints_lookup results are cached under a
+normalized filter key with a TTL and an LRU size bound. Writes invalidate
+exactly the keys whose filter the written row matches (before and after the
+write), so a client's repeated "Check Status" clicks are served from memory
+while support agents still see their own updates immediately.
+
+Settings: CQ_CACHE_TTL (seconds, default 60), CQ_CACHE_MAXSIZE (default 512).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def load_cache_settings():
+    return {
+        "ttl": float(os.environ.get("CQ_CACHE_TTL", "60")),
+        "maxsize": int(os.environ.get("CQ_CACHE_MAXSIZE", "512")),
+    }
+
+
+# ---------------- key helpers ----------------
+def _norm_email(value):
+    value = str(value or "").strip().lower()
+    return value or None
+
+def _norm_text(value):
+    value = str(value or "").strip()
+    return value or None
+
+def _norm_status(value):
+    value = str(value or "").strip()
+    return None if value in ("", "all") else value
+
+def open_complaints_key(email_val, mobile_val):
+    """
+    Key for fetch_open_complaints: (email OR mobile) AND status = 'open'.
+    """
+    return ("open", None, _norm_email(email_val), _norm_text(mobile_val), "open", None)
+
+def lookup_key(name_val=None, email_val=None, mobile_val=None, status_filter=None, query_id_val=None):
+    """
+    Key for fetch_complaints_lookup: every provided filter is ANDed.
+    """
+    return (
+        "lookup",
+        _norm_text(name_val),
+        _norm_email(email_val),
+        _norm_text(mobile_val),
+        _norm_status(status_filter),
+        int(query_id_val) if query_id_val is not None else None,
+    )
+
+def key_matches_row(key, row):
+    """
+    True if a complaint row (dict with name/email/mobile/status/query_id) would
+    appear in the result cached under `key`.
+    """
+    kind, name, email, mobile, status, query_id = key
+    row_email = _norm_email(row.get("email"))
+    row_mobile = _norm_text(row.get("mobile"))
+    if status is not None and _norm_text(row.get("status")) != status:
+        return False
+    if kind == "open":
+        return (email is not None and email == row_email) or (mobile is not None and mobile == row_mobile)
+    if name is not None and name != _norm_text(row.get("name")):
+        return False
+    if email is not None and email != row_email:
+        return False
+    if mobile is not None and mobile != row_mobile:
+        return False
+    if query_id is not None and row.get("query_id") is not None and int(row["query_id"]) != query_id:
+        return False
+    return True
+
+
+# ---------------- cache ----------------
+class QueryCache:
+    """
+    Thread-safe TTL + LRU cache of query results (DataFrames).
+    """
+
+    def __init__(self, ttl=60.0, maxsize=512):
+        self.ttl = float(ttl)
+        self.maxsize = max(1, int(maxsize))
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Cached value for key, or None if missing / expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate_rows(self, *rows):
+        """
+        Drop every key whose filter matches any of the given complaint rows.
+        Pass the row as it was before a write and as it is after it.
+        Returns the number of keys removed.
+        """
+        with self._lock:
+            stale = [k for k in self._data if any(key_matches_row(k, r) for r in rows)]
+            for k in stale:
+                del self._data[k]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses,
+                    "ttl": self.ttl, "maxsize": self.maxsize}
@@ -0,0 +1,525 @@
+"""
+Schema introspection and query_id allocation for customer_data.
+
+The app used to probe `SHOW COLUMNS` on every insert and then compute
+MAX(query_id)+1, which costs extra round trips and races between concurrent
+submitters. Instead:
+
+- SchemaInspector reads the table's columns once and caches the
+  capabilities the app cares about (AUTO_INCREMENT query_id, remarks column),
+  re-reading them every CQ_SCHEMA_TTL seconds (default 300) in the app.
+- QueryIdAllocator hands out ids from blocks reserved atomically in a small
+  sequence table, so an insert is a single statement and two processes can
+  never receive the same id.
+- apply_indexes / migrate_status_not_null create the indexes the app's
+  access paths rely on (including the FULLTEXT index behind the Support
+  search box), and check_query_plans EXPLAINs those queries and warns about
+  planned full table scans.
+
+Migrations are run by hand, not on app start (DDL on a large table is slow):
+
+    python schema.py migrate     # add updated_at / idempotency_key / analytics_counted, create missing
+                                 # indexes, make status NOT NULL
+    python schema.py explain     # run the plan check for the app's queries
+
+The plan check also runs once per process, when a page first uses the database.
+Restart the app after a migration: until the capabilities are re-read it
+keeps using the old column list.
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+from mysql.connector import errors
+
+log = logging.getLogger(__name__)
+
+SEQUENCE_TABLE = "customer_data_seq"
+# closed complaints moved out of the hot table (archive.py)
+ARCHIVE_TABLE = "customer_data_archive"
+# one row (name = ARCHIVE_TABLE) holding the number of archived complaints, kept by archive.py
+ARCHIVE_COUNT_TABLE = "customer_data_archive_count"
+DUPLICATE_KEY_ERRNO = 1062
+
+
+def load_schema_settings():
+    return {"ttl": float(os.environ.get("CQ_SCHEMA_TTL", "300")),
+            "archive_recheck": float(os.environ.get("CQ_ARCHIVE_RECHECK", "30"))}
+
+
+class SchemaInspector:
+    """
+    Detects customer_data capabilities and caches them, for `ttl` seconds
+    (None: until refresh()). A missing archive table is looked for again at
+    most every `archive_recheck` seconds (see has_archive).
+    """
+
+    def __init__(self, db, table="customer_data", ttl=None, archive_recheck=30.0):
+        self.db = db
+        self.table = table
+        self.ttl = ttl
+        self.archive_recheck = float(archive_recheck)
+        self._lock = threading.Lock()
+        self._caps = None
+        self._detected_at = 0.0
+        self._archive_checked_at = None  # monotonic time of the last look for the archive table
+
+    def _detect(self):
+        caps = {"columns": [], "query_id_auto_increment": False, "has_remarks": False,
+                "has_updated_at": False, "has_idempotency_key": False, "fulltext_columns": None,
+                "has_archive": False}
+        try:
+            with self.db.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(f"SHOW COLUMNS FROM {self.table}")
+                rows = cur.fetchall()
+                cur.close()
+        except Exception as e:
+            # same fallback as before: assume no auto-increment, let the app compute ids
+            log.warning("Could not inspect %s columns: %s", self.table, e)
+            return caps, False
+        # SHOW COLUMNS returns: Field, Type, Null, Key, Default, Extra
+        for row in rows:
+            field = str(row[0])
+            caps["columns"].append(field)
+            if field == "query_id" and len(row) >= 6:
+                caps["query_id_auto_increment"] = "auto_increment" in str(row[5] or "").lower()
+        caps["has_remarks"] = "remarks" in caps["columns"]
+        caps["has_updated_at"] = "updated_at" in caps["columns"]
+        caps["has_idempotency_key"] = "idempotency_key" in caps["columns"]
+        try:
+            with self.db.connection() as conn:
+                cur = conn.cursor()
+                caps["fulltext_columns"] = search_index_columns(existing_indexes(cur, self.table, "FULLTEXT"))
+                cur.close()
+        except Exception as e:
+            # no FULLTEXT support / no SHOW INDEX: search falls back to LIKE
+            log.info("No full-text index detected on %s: %s", self.table, e)
+        try:
+            with self.db.connection() as conn:
+                cur = conn.cursor()
+                caps["has_archive"] = table_exists(cur, ARCHIVE_TABLE)
+                cur.close()
+        except Exception as e:
+            log.info("Could not check for %s: %s", ARCHIVE_TABLE, e)
+        return caps, True
+
+    def capabilities(self):
+        """
+        Cached capability dict: columns, query_id_auto_increment, has_remarks,
+        has_updated_at, has_idempotency_key, fulltext_columns (MATCH() column
+        list of the search index, or None), has_archive (archive.py has
+        created customer_data_archive).
+
+        When the table cannot be inspected (e.g. the database is briefly
+        unreachable) the fallback is returned but not cached, so the next
+        call tries again; once the ttl has passed, a failed re-detection
+        keeps the previous capabilities.
+        """
+        caps = self._caps
+        if caps is not None and not self._expired():
+            return caps
+        with self._lock:
+            if self._caps is not None and not self._expired():
+                return self._caps
+            caps, complete = self._detect()
+            if not complete:
+                return self._caps or caps
+            self._caps, self._detected_at = caps, time.monotonic()
+            self._archive_checked_at = self._detected_at
+        return caps
+
+    def _expired(self):
+        return self.ttl is not None and time.monotonic() - self._detected_at >= self.ttl
+
+    def has_archive(self):
+        """
+        Whether customer_data_archive exists. "Yes" is final; a cached "no"
+        is checked again with one SHOW TABLES at most every archive_recheck
+        seconds (archive.py may have created the table since), so readers
+        pick up a new archive within that time without a round trip per call.
+        """
+        if self.capabilities()["has_archive"]:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            if self._archive_checked_at is not None and now - self._archive_checked_at < self.archive_recheck:
+                return False
+            self._archive_checked_at = now
+        try:
+            with self.db.connection() as conn:
+                cur = conn.cursor()
+                exists = table_exists(cur, ARCHIVE_TABLE)
+                cur.close()
+        except Exception as e:
+            log.info("Could not check for %s: %s", ARCHIVE_TABLE, e)
+            return False
+        if exists:
+            self.refresh()
+        return exists
+
+    def refresh(self):
+        """
+        Forget the cached capabilities (e.g. after a migration).
+        """
+        with self._lock:
+            self._caps = None
+
+
+class QueryIdAllocator:
+    """
+    Race-free query_id allocation for tables without AUTO_INCREMENT.
+
+    A block of `block_size` ids is reserved with one atomic
+    UPDATE ... SET next_id = LAST_INSERT_ID(next_id + n), then handed out from
+    memory, so most inserts need no extra round trip at all.
+    """
+
+    def __init__(self, db, block_size=50, table="customer_data"):
+        self.db = db
+        self.block_size = max(1, int(block_size))
+        self.table = table
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0  # exclusive
+        self._ready = False
+
+    def _ensure_sequence(self, cur):
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {SEQUENCE_TABLE} (
+                name VARCHAR(64) NOT NULL PRIMARY KEY,
+                next_id BIGINT NOT NULL
+            )
+        """)
+        # seed from the current data the first time only
+        cur.execute(
+            f"INSERT IGNORE INTO {SEQUENCE_TABLE} (name, next_id) "
+            f"SELECT %s, COALESCE(MAX(query_id), 0) + 1 FROM {self.table}",
+            (self.table + ".query_id",)
+        )
+
+    def _reserve(self, count):
+        """
+        Reserve `count` ids; returns the first one.
+        """
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            if not self._ready:
+                self._ensure_sequence(cur)
+                self._ready = True
+            cur.execute(
+                f"UPDATE {SEQUENCE_TABLE} SET next_id = LAST_INSERT_ID(next_id + %s) WHERE name = %s",
+                (count, self.table + ".query_id")
+            )
+            end = cur.lastrowid
+            if not end:
+                cur.execute("SELECT LAST_INSERT_ID()")
+                end = cur.fetchone()[0]
+            conn.commit()
+            cur.close()
+        return int(end) - count
+
+    def next_id(self):
+        """
+        Next free query_id.
+        """
+        with self._lock:
+            if self._next >= self._end:
+                self._next = self._reserve(self.block_size)
+                self._end = self._next + self.block_size
+            nxt = self._next
+            self._next += 1
+            return nxt
+
+    def reserve_block(self, count):
+        """
+        Reserve `count` consecutive ids directly (bulk loads); returns a range.
+        """
+        first = self._reserve(int(count))
+        return range(first, first + int(count))
+
+    def resync(self):
+        """
+        Move the sequence past MAX(query_id) (rows inserted by other tools) and drop the local block.
+        """
+        with self._lock:
+            with self.db.connection() as conn:
+                cur = conn.cursor()
+                if not self._ready:
+                    self._ensure_sequence(cur)
+                    self._ready = True
+                cur.execute(
+                    f"UPDATE {SEQUENCE_TABLE} SET next_id = GREATEST(next_id, "
+                    f"(SELECT COALESCE(MAX(query_id), 0) + 1 FROM {self.table})) WHERE name = %s",
+                    (self.table + ".query_id",)
+                )
+                conn.commit()
+                cur.close()
+            self._next = self._end = 0
+
+
+def is_duplicate_key(exc):
+    return isinstance(exc, errors.IntegrityError) and getattr(exc, "errno", None) == DUPLICATE_KEY_ERRNO
+
+
+# ---------------- indexes ----------------
+# (index name, columns) for customer_data's access paths:
+#   client open complaints  -> email/mobile branch + status, newest first
+#   support list            -> ORDER BY created_at DESC, query_id DESC (optionally by status)
+#   support change feed     -> updated_at >= watermark, oldest first
+#   archive job             -> status = 'closed' AND closed_at < cutoff
+INDEXES = [
+    ("idx_cd_email_status_created", ("email", "status", "created_at")),
+    ("idx_cd_mobile_status_created", ("mobile", "status", "created_at")),
+    ("idx_cd_created_id", ("created_at", "query_id")),
+    ("idx_cd_status_created_id", ("status", "created_at", "query_id")),
+    ("idx_cd_updated_id", ("updated_at", "query_id")),
+    ("idx_cd_status_closed", ("status", "closed_at")),
+]
+
+# Support search box: one FULLTEXT index over the free-text columns (remarks
+# only when the table has it). MATCH() must name exactly the index's columns.
+TEXT_SEARCH_COLUMNS = ("query_heading", "query_description", "remarks")
+FULLTEXT_INDEX = "ftx_cd_text"
+
+
+def table_exists(cur, table):
+    cur.execute(f"SHOW TABLES LIKE '{table}'")
+    return bool(cur.fetchall())
+
+
+def existing_indexes(cur, table="customer_data", index_type=None):
+    """
+    {index name: [columns in order]} from SHOW INDEX, optionally only one
+    Index_type (e.g. "FULLTEXT").
+    """
+    cur.execute(f"SHOW INDEX FROM {table}")
+    names = [d[0].lower() for d in cur.description]
+    indexes = {}
+    for row in cur.fetchall():
+        rec = dict(zip(names, row))
+        if index_type and str(rec.get("index_type") or "").upper() != index_type:
+            continue
+        indexes.setdefault(rec["key_name"], []).append((int(rec["seq_in_index"]), rec["column_name"]))
+    return {name: [col for _, col in sorted(cols)] for name, cols in indexes.items()}
+
+
+def search_index_columns(fulltext_indexes):
+    """
+    Column list of the FULLTEXT index usable for complaint search (covers at
+    least heading and description; the widest one wins), or None.
+    """
+    usable = [cols for cols in fulltext_indexes.values()
+              if {"query_heading", "query_description"} <= set(cols)]
+    return tuple(max(usable, key=len)) if usable else None
+
+
+def apply_indexes(db, table="customer_data", indexes=None):
+    """
+    Create every index in INDEXES whose column list is not already covered by
+    an existing index (same leading columns). Returns the names created.
+    """
+    created = []
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SHOW COLUMNS FROM {table}")
+        columns = {str(row[0]) for row in cur.fetchall()}
+        fulltext = existing_indexes(cur, table, "FULLTEXT")
+        current = {name: cols for name, cols in existing_indexes(cur, table).items() if name not in fulltext}
+        wanted = list(indexes or INDEXES)
+        # point lookups by query_id (Update Status) need at least a plain index
+        if not any(cols[:1] == ["query_id"] for cols in current.values()):
+            wanted.append(("idx_cd_query_id", ("query_id",)))
+        for name, cols in wanted:
+            if name in current or any(have[:len(cols)] == list(cols) for have in current.values()):
+                continue
+            if not set(cols) <= columns:
+                log.warning("Skipping index %s: %s lacks column(s) %s", name, table, ", ".join(sorted(set(cols) - columns)))
+                continue
+            log.info("Creating index %s on %s(%s)", name, table, ", ".join(cols))
+            cur.execute(f"CREATE INDEX {name} ON {table} ({', '.join(cols)})")
+            created.append(name)
+
+        # full-text search over the free-text columns the table actually has
+        text_cols = [c for c in TEXT_SEARCH_COLUMNS if c in columns]
+        if search_index_columns(fulltext) != tuple(text_cols) and FULLTEXT_INDEX not in fulltext:
+            log.info("Creating FULLTEXT index %s on %s(%s)", FULLTEXT_INDEX, table, ", ".join(text_cols))
+            cur.execute(f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX} ON {table} ({', '.join(text_cols)})")
+            created.append(FULLTEXT_INDEX)
+        cur.close()
+    return created
+
+
+def migrate_updated_at(db, table="customer_data"):
+    """
+    Add updated_at DATETIME(6), maintained by MySQL on insert and on every
+    update (so writers other than the app are covered too) and backfilled
+    from closed_at / created_at. Returns True if the column was added.
+    """
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SHOW COLUMNS FROM {table} LIKE 'updated_at'")
+        if cur.fetchall():
+            cur.close()
+            return False
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN updated_at DATETIME(6) NOT NULL "
+                    f"DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)")
+        cur.execute(f"UPDATE {table} SET updated_at = COALESCE(closed_at, created_at, updated_at)")
+        cur.close()
+    return True
+
+
+def migrate_idempotency_key(db, table="customer_data"):
+    """
+    Add idempotency_key CHAR(64) NULL with a unique index, so the write queue
+    (write_queue.py) can retry a batch without creating duplicates. Rows
+    inserted by other paths keep NULL. Returns True if the column was added.
+    """
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SHOW COLUMNS FROM {table} LIKE 'idempotency_key'")
+        if cur.fetchall():
+            cur.close()
+            return False
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN idempotency_key CHAR(64) NULL, "
+                    f"ADD UNIQUE INDEX uq_cd_idempotency_key (idempotency_key)")
+        cur.close()
+    return True
+
+
+def migrate_analytics_counted(db, table="customer_data"):
+    """
+    Add analytics_counted (analytics.py counts each row once by this flag
+    instead of by a query_id watermark). The column defaults to 0 and rows
+    up to the current watermark are marked counted in the same step, the
+    rest are left to the next catch-up. Returns True if the column was added.
+    """
+    from analytics import COUNTED_COLUMN, WATERMARK_NAME, WATERMARK_TABLE  # analytics imports this module
+
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SHOW COLUMNS FROM {table} LIKE '{COUNTED_COLUMN}'")
+        if cur.fetchall():
+            cur.close()
+            return False
+        cur.execute(f"SHOW COLUMNS FROM {table} LIKE 'updated_at'")
+        keep = ", updated_at = updated_at" if cur.fetchall() else ""
+        has_watermark = table_exists(cur, WATERMARK_TABLE)
+        # no insert and no catch-up between adding the column and the backfill: a row written in
+        # between would get marked counted without being folded, or be folded a second time
+        cur.execute(f"LOCK TABLES {table} WRITE" + (f", {WATERMARK_TABLE} WRITE" if has_watermark else ""))
+        try:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {COUNTED_COLUMN} TINYINT(1) NOT NULL DEFAULT 0, "
+                        f"ADD INDEX idx_cd_{COUNTED_COLUMN} ({COUNTED_COLUMN})")
+            watermark = 0  # no summaries yet: everything is folded by the first catch-up
+            if has_watermark:
+                cur.execute(f"SELECT last_query_id FROM {WATERMARK_TABLE} WHERE name = %s", (WATERMARK_NAME,))
+                row = cur.fetchone()
+                watermark = int(row[0]) if row else 0
+            if watermark:
+                cur.execute(f"UPDATE {table} SET {COUNTED_COLUMN} = 1{keep} WHERE query_id <= %s", (watermark,))
+        finally:
+            cur.execute("UNLOCK TABLES")
+        cur.close()
+    return True
+
+
+def migrate_status_not_null(db, default="open", table="customer_data"):
+    """
+    Backfill NULL statuses with `default` and make the column NOT NULL DEFAULT
+    `default`, keeping its current type. Returns True if the column was changed.
+    """
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SHOW COLUMNS FROM {table} LIKE 'status'")
+        row = cur.fetchone()
+        if not row:
+            cur.close()
+            return False
+        col_type, nullable = row[1], str(row[2]).upper()
+        if isinstance(col_type, bytes):
+            col_type = col_type.decode()
+        if nullable == "NO":
+            cur.close()
+            return False
+        cur.execute(f"UPDATE {table} SET status = %s WHERE status IS NULL", (default,))
+        cur.execute(f"ALTER TABLE {table} MODIFY status {col_type} NOT NULL DEFAULT %s", (default,))
+        cur.close()
+    return True
+
+
+# ---------------- plan check ----------------
+def explain(cur, sql, params):
+    """
+    EXPLAIN rows for one query as dicts (id, select_type, table, type, key, rows, Extra...).
+    """
+    cur.execute("EXPLAIN " + sql, params)
+    names = [d[0] for d in cur.description]
+    return [dict(zip(names, r)) for r in cur.fetchall()]
+
+
+def check_query_plans(db, queries):
+    """
+    EXPLAIN each (sql, params) in `queries` ({name: (sql, params)}) and log a
+    warning for every table access planned as a full scan (type ALL).
+    Returns a list of warning strings; failures to EXPLAIN are reported too.
+    """
+    warnings = []
+    try:
+        with db.connection() as conn:
+            cur = conn.cursor()
+            for name, (sql, params) in queries.items():
+                try:
+                    plan = explain(cur, sql, params)
+                except Exception as e:
+                    warnings.append(f"{name}: EXPLAIN failed ({e})")
+                    continue
+                for step in plan:
+                    if str(step.get("type") or "").upper() == "ALL":
+                        warnings.append(
+                            f"{name}: full table scan planned on {step.get('table')} "
+                            f"(~{step.get('rows')} rows, possible keys: {step.get('possible_keys') or 'none'})"
+                        )
+            cur.close()
+    except Exception as e:
+        warnings.append(f"query plan check skipped: {e}")
+    for w in warnings:
+        log.warning(w)
+    return warnings
+
+
+def main(argv=None):
+    from db import ConnectionManager, load_db_config
+
+    parser = argparse.ArgumentParser(description="customer_data schema management")
+    parser.add_argument("command", choices=["migrate", "explain"])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    db = ConnectionManager(load_db_config(), pool_size=1)
+    try:
+        if args.command == "migrate":
+            if migrate_updated_at(db):
+                print("Added updated_at (change feed)")
+            if migrate_idempotency_key(db):
+                print("Added idempotency_key (write queue)")
+            if migrate_analytics_counted(db):
+                print("Added analytics_counted; run `python analytics.py rebuild` to recount rows missed before")
+            created = apply_indexes(db)
+            print("Indexes created: " + (", ".join(created) if created else "none (all present)"))
+            if migrate_status_not_null(db):
+                print("status is now NOT NULL DEFAULT 'open'")
+        else:
+            from data_access import planned_queries  # data_access imports this module
+            problems = check_query_plans(db, planned_queries(SchemaInspector(db).capabilities()))
+            print("\n".join(problems) if problems else "No full table scans planned.")
+    finally:
+        db.close_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Shared services for the Streamlit pages, created once per server process.
+
+The app used to be a single script: every rerun, whatever the page, rebuilt
+its module-level state (pool, store, write queue, plan check) and walked past
+the code of every page. Now client_q.py only routes (st.navigation) and runs
+the active page under app_pages/; the objects those pages share live here
+behind st.cache_resource, so a rerun costs one dictionary lookup per service.
+
+data_access / analytics (and pandas with them) are imported on first use of
+get_store(), and the pages import them (and shaping.py) below their login
+gate; ui.py takes its display constants from the pandas-free formats.py. So
+the Home page and the login forms never load them.
+"""
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from db import ConnectionManager, ReplicaRouter, load_db_config, load_pool_settings, load_replica_settings
+from instrumentation import Instrumentation, load_instrumentation_settings
+from query_cache import QueryCache, load_cache_settings
+from schema import SchemaInspector, check_query_plans, load_schema_settings
+from write_queue import ComplaintWriteQueue, load_write_queue_settings
+
+
+@st.cache_resource
+def get_instrumentation():
+    # timing of SQL / shaping / rendering (see instrumentation.py)
+    return Instrumentation(**load_instrumentation_settings())
+
+
+def current_session_id():
+    # also set in button callbacks and fragments, which run before / outside the page script
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+
+@st.cache_resource
+def get_db():
+    # one pool per server process, shared by every session and rerun (CQ_DB_* env vars, see db.py);
+    # with CQ_DB_REPLICAS set, reads go to replica pools and a session that just wrote sticks to the primary
+    instr, pool_settings, replica_settings = get_instrumentation(), load_pool_settings(), load_replica_settings()
+    primary = ConnectionManager(load_db_config(), instrumentation=instr, **pool_settings)
+    replicas = [ConnectionManager(config, instrumentation=instr, **pool_settings)
+                for config in replica_settings["replicas"]]
+    return ReplicaRouter(primary, replicas, replica_settings["sticky_seconds"], replica_settings["retry_after"],
+                         session_key=current_session_id)
+
+
+@st.cache_resource
+def get_query_cache():
+    # lookup results shared across sessions; writes invalidate affected keys
+    return QueryCache(**load_cache_settings())
+
+
+@st.cache_resource
+def get_schema():
+    # customer_data capabilities (remarks, updated_at, FULLTEXT index, archive...), shared by the store and the plan check
+    # re-read every CQ_SCHEMA_TTL seconds as a safety net; restart the app after `schema.py migrate`
+    return SchemaInspector(get_db(), **load_schema_settings())
+
+
+@st.cache_resource
+def get_plan_warnings():
+    # EXPLAIN the hot queries once per process and log any planned full scans
+    from data_access import planned_queries
+
+    return check_query_plans(get_db(), planned_queries(get_schema().capabilities()))
+
+
+@st.cache_resource
+def get_store():
+    # schema capabilities / id blocks are detected and reserved once per process
+    from analytics import AnalyticsSummary
+    from data_access import ComplaintStore
+
+    get_plan_warnings()
+    db = get_db()
+    return ComplaintStore(db, cache=get_query_cache(), schema=get_schema(), instrumentation=get_instrumentation(),
+                          analytics=AnalyticsSummary(db))
+
+
+@st.cache_resource
+def get_write_queue():
+    # "Raise Query" submissions are written in batches by a background worker (see write_queue.py)
+    return ComplaintWriteQueue(get_store(), **load_write_queue_settings())
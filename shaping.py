@@ -0,0 +1,98 @@
+"""
+Result shaping shared by every complaint fetch path.
+
+Query results are kept with native datetime64 timestamp columns so they can
+be sorted/filtered cheaply. Turning timestamps into "dd-mm-yyyy HH:MM:SS"
+strings is left to the display layer: st.dataframe formats them with
+DISPLAY_DATETIME_FORMAT (formats.py) on the client (only the visible rows), and
+format_value() formats single cells for text output.
+"""
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+
+from formats import TIMESTAMP_COLUMNS, DISPLAY_TS_FORMAT
+
+
+def shape_complaints(rows, cols):
+    """
+    Build the complaints DataFrame from cursor rows.
+
+    MySQL returns DATETIME columns as datetime objects, which pandas already
+    stores as datetime64; the (comparatively expensive) parse only runs when a
+    column arrived as something else, e.g. strings or all-NULL.
+    """
+    df = pd.DataFrame(rows, columns=cols)
+    for col in TIMESTAMP_COLUMNS:
+        if col in df.columns and not is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    if "remarks" in df.columns:
+        df["remarks"] = df["remarks"].fillna("")
+    return df
+
+
+def format_value(value):
+    """
+    Display string for a single cell (timestamps formatted, missing values blank).
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if hasattr(value, "strftime"):
+        return value.strftime(DISPLAY_TS_FORMAT)
+    return str(value)
+
+
+def index_by_query_id(df):
+    """
+    Copy of df indexed by query_id, so a complaint is found with df.loc[id] instead of a scan.
+    """
+    df = df.copy()
+    # unnamed (a Series would lend its name), so "query_id" stays unambiguous in sort_values etc.
+    df.index = pd.Index(df["query_id"].to_numpy(dtype="int64"))
+    return df
+
+
+def drop_seen_changes(changes, seen, horizon):
+    """
+    Rows of a change-feed batch not already seen with the same updated_at.
+    Returns (unseen rows, updated `seen` {query_id: updated_at}); entries older
+    than `horizon` are pruned since no later poll re-reads them.
+    """
+    if changes.empty:
+        return changes, {qid: ts for qid, ts in seen.items() if ts >= horizon}
+    mask = [seen.get(int(qid)) != ts for qid, ts in zip(changes["query_id"], changes["updated_at"])]
+    unseen = changes[mask]
+    seen = dict(seen)
+    seen.update((int(qid), ts) for qid, ts in zip(unseen["query_id"], unseen["updated_at"]))
+    return unseen, {qid: ts for qid, ts in seen.items() if ts >= horizon}
+
+
+def move_status_count(counts, old_status, new_status):
+    """
+    Adjust {status: count} in place for one complaint moving from old_status
+    to new_status; a status whose count reaches 0 is dropped.
+    """
+    if old_status == new_status:
+        return
+    counts[old_status] = counts.get(old_status, 1) - 1
+    if counts[old_status] <= 0:
+        del counts[old_status]
+    counts[new_status] = counts.get(new_status, 0) + 1
+
+
+def merge_changed_rows(df, changes, accept_new=None):
+    """
+    Merge changed rows into a page frame, both indexed by query_id. Rows
+    already on the page are overwritten in place; other rows are added when
+    accept_new(row) is true. Returns (frame sorted newest first, added ids, updated ids).
+    """
+    on_page = [qid for qid in changes.index if qid in df.index]
+    shared = [c for c in df.columns if c in changes.columns]
+    if on_page:
+        df = df.copy()
+        df.loc[on_page, shared] = changes.loc[on_page, shared]
+    added = [qid for qid, row in changes.iterrows()
+             if qid not in df.index and accept_new is not None and accept_new(row)]
+    if added:
+        df = pd.concat([df, changes.loc[added, shared]])
+        df = df.sort_values(["created_at", "query_id"], ascending=False, na_position="last")
+    return df, added, on_page
@@ -0,0 +1,31 @@
+"""
+Widgets and helpers shared by the Client and Support pages (app_pages/).
+"""
+import streamlit as st
+
+from export import EXPORT_FORMATS, available_formats, export_query, export_file_name, load_export_settings
+from services import get_db
+from formats import TIMESTAMP_COLUMNS, DISPLAY_DATETIME_FORMAT
+
+
+# timestamps stay datetime64 in the frames; the grid formats only what it renders
+COMPLAINT_COLUMN_CONFIG = {c: st.column_config.DatetimeColumn(c, format=DISPLAY_DATETIME_FORMAT) for c in TIMESTAMP_COLUMNS}
+
+# ---------------- Exports ----------------
+export_settings = load_export_settings()
+
+
+def export_buttons(key, view, sql_params):
+    # the query only runs when a button is clicked (deferred data), streamed in chunks by export.py
+    sql, params = sql_params
+
+    def build(fmt):
+        out, _ = export_query(get_db(), sql, params, fmt, chunk_rows=export_settings["chunk_rows"])
+        with out:
+            return out.read()
+
+    formats = available_formats()
+    for col, fmt in zip(st.columns(len(formats) + 2)[:len(formats)], formats):
+        with col:
+            st.download_button(f"⬇️ {fmt.upper()}", data=lambda fmt=fmt: build(fmt), file_name=export_file_name(view, fmt),
+                               mime=EXPORT_FORMATS[fmt], key=f"{key}_{fmt}", on_click="ignore")
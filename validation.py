@@ -0,0 +1,20 @@
+"""
+Validation rules for new complaints, shared by the "Raise Query" form and
+the bulk ingestion CLI (ingest.py).
+"""
+
+# (record field, label shown to the user)
+REQUIRED_FIELDS = [
+    ("name", "Name"),
+    ("email", "Email"),
+    ("mobile", "Mobile"),
+    ("query_heading", "Query Heading"),
+    ("query_description", "Query Description"),
+]
+
+
+def missing_required_fields(record):
+    """
+    Labels of the required fields that are empty/blank in `record` (a dict).
+    """
+    return [label for field, label in REQUIRED_FIELDS if not str(record.get(field) or "").strip()]
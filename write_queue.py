@@ -0,0 +1,240 @@
+"""
+Write-behind queue for "Raise Query" submissions.
+
+Submitting used to block the client's session on id allocation, the INSERT,
+the commit and a follow-up read, and a double-click could create the same
+complaint twice. Instead the page hands the form to ComplaintWriteQueue and
+gets a tracking id back immediately; a worker thread drains the queue and
+inserts what has accumulated in one transaction (ComplaintStore.insert_complaints).
+
+Each submission carries an idempotency key derived from the session and the
+form contents. Re-submitting the same form in the same session returns the
+same tracking id, and once `python schema.py migrate` has added the unique
+customer_data.idempotency_key column the database drops duplicates too
+(INSERT ... ON DUPLICATE KEY UPDATE), so retrying a batch after a lost
+connection is safe. A batch the database rejects for any other reason (one
+over-long field, a constraint) is written again row by row, so only the
+offending submission fails; it fails at once, as only connection errors are
+retried.
+
+The queue lives in process memory: submissions not yet written when the
+process is killed are lost (an orderly exit drains the queue first).
+
+Settings: CQ_WRITE_BATCH_SIZE (default 50), CQ_WRITE_MAX_WAIT seconds to let
+a batch fill (default 0.05), CQ_WRITE_RETRIES (default 3).
+"""
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+
+from db import CONNECTION_ERRORS
+
+log = logging.getLogger(__name__)
+
+FORM_FIELDS = ("name", "email", "mobile", "query_heading", "query_description")
+
+
+def load_write_queue_settings():
+    return {
+        "batch_size": int(os.environ.get("CQ_WRITE_BATCH_SIZE", "50")),
+        "max_wait": float(os.environ.get("CQ_WRITE_MAX_WAIT", "0.05")),
+        "retries": int(os.environ.get("CQ_WRITE_RETRIES", "3")),
+    }
+
+
+def idempotency_key(session_id, record):
+    """
+    sha256 hex of the session id and the normalized form fields.
+    """
+    parts = [str(session_id)] + [" ".join(str(record.get(f) or "").split()) for f in FORM_FIELDS]
+    parts[2] = parts[2].lower()  # email
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class ComplaintWriteQueue:
+    """
+    In-process write-behind queue with batching and idempotent submission.
+    """
+
+    def __init__(self, store, batch_size=50, max_wait=0.05, retries=3, keep_done_seconds=3600):
+        self.store = store
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = float(max_wait)
+        self.retries = max(0, int(retries))
+        self.keep_done_seconds = float(keep_done_seconds)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._tickets = {}   # tracking id -> ticket dict
+        self._worker = None
+        self._closed = False
+        self._metrics = {"submitted": 0, "deduplicated": 0, "saved": 0, "failed": 0,
+                         "batches": 0, "retries": 0, "write_seconds_total": 0.0}
+        atexit.register(self.close)
+
+    # ---------------- submission ----------------
+    def submit(self, record, session_id):
+        """
+        Queue one complaint ({name, email, mobile, query_heading, query_description}).
+        Returns its tracking id at once; an identical pending or saved
+        submission from the same session returns the existing id instead.
+        """
+        key = idempotency_key(session_id, record)
+        tracking_id = key[:12].upper()
+        # the worker writes on the submitting session's behalf (read-your-writes routing, db.py)
+        db_session = self.store.db.current_session()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("write queue is closed")
+            ticket = self._tickets.get(tracking_id)
+            if ticket is not None and ticket["state"] != "failed":
+                self._metrics["deduplicated"] += 1
+                return tracking_id
+            self._tickets[tracking_id] = {"state": "queued", "query_id": None, "error": None,
+                                          "submitted_at": time.time(), "done_at": None}
+            self._metrics["submitted"] += 1
+            self._prune()
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="complaint-writer", daemon=True)
+                self._worker.start()
+        self._queue.put((tracking_id, dict({f: record.get(f) for f in FORM_FIELDS}, idempotency_key=key), db_session))
+        return tracking_id
+
+    def status(self, tracking_id):
+        """
+        {"state": "queued" | "saved" | "failed" | "unknown", "query_id", "error"}.
+        """
+        with self._lock:
+            ticket = self._tickets.get(tracking_id)
+            if ticket is None:
+                return {"state": "unknown", "query_id": None, "error": None}
+            return {k: ticket[k] for k in ("state", "query_id", "error")}
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_done_seconds
+        for tid in [t for t, tk in self._tickets.items() if tk["done_at"] and tk["done_at"] < cutoff]:
+            del self._tickets[tid]
+
+    # ---------------- worker ----------------
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            self._queue.task_done()
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # put the stop marker back so the loop sees it after this batch
+                self._queue.task_done()
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _insert(self, records, retry_on):
+        """
+        store.insert_complaints(records), retried with backoff on `retry_on` errors.
+        """
+        for attempt in range(self.retries + 1):
+            started = time.monotonic()
+            try:
+                return self.store.insert_complaints(records)
+            except retry_on as e:
+                log.warning("Complaint batch of %d failed (attempt %d): %s", len(records), attempt + 1, e)
+                if attempt == self.retries:
+                    raise
+                with self._lock:
+                    self._metrics["retries"] += 1
+                time.sleep(min(0.5 * 2 ** attempt, 5.0))
+            finally:
+                with self._lock:
+                    self._metrics["write_seconds_total"] += time.monotonic() - started
+
+    def _write(self, batch):
+        records = [record for _, record, _ in batch]
+        try:
+            # the whole batch is only retried when the connection failed
+            results = [(query_id, None) for query_id in self._insert(records, CONNECTION_ERRORS)]
+        except CONNECTION_ERRORS as e:
+            results = [(None, e)] * len(batch)
+        except Exception as e:
+            if len(batch) > 1:
+                log.warning("Complaint batch of %d rejected (%s), writing it row by row", len(batch), e)
+            # one bad record must not fail the others: each row on its own, so only it fails.
+            # a data error fails its row at once; only a lost connection is worth retrying
+            results = []
+            for record in records:
+                try:
+                    results.append((self._insert([record], CONNECTION_ERRORS)[0], None))
+                except Exception as row_error:
+                    results.append((None, row_error))
+        for db_session in {s for (_, _, s), (_, error) in zip(batch, results) if s is not None and error is None}:
+            self.store.db.mark_written(db_session)
+        now = time.time()
+        with self._lock:
+            self._metrics["batches"] += 1
+            for (tracking_id, _, _), (query_id, error) in zip(batch, results):
+                ticket = self._tickets.get(tracking_id)
+                if ticket is None:
+                    continue
+                if error is None:
+                    ticket.update(state="saved", query_id=query_id, done_at=now)
+                    self._metrics["saved"] += 1
+                else:
+                    ticket.update(state="failed", error=str(error), done_at=now)
+                    self._metrics["failed"] += 1
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._write(batch)
+            except Exception:
+                log.exception("Complaint writer crashed on a batch")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    # ---------------- lifecycle ----------------
+    def flush(self, timeout=None):
+        """
+        Wait until everything submitted so far is written (or failed). Returns True if drained.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=10.0):
+        """
+        Stop accepting submissions, drain the queue and stop the worker.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            worker = self._worker
+        if worker is not None and worker.is_alive():
+            self._queue.put(None)
+            worker.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["pending"] = sum(1 for t in self._tickets.values() if t["state"] == "queued")
+        snapshot["mean_batch_size"] = round(
+            (snapshot["saved"] + snapshot["failed"]) / snapshot["batches"], 2) if snapshot["batches"] else 0.0
+        return snapshot